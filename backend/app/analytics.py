@@ -0,0 +1,288 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import and_
+from sqlalchemy.orm import aliased
+from sqlmodel import select
+
+from .database import get_session
+from .models import EvaluationItemResult, EvaluationRun, EvaluationScore
+from .persistence import RESULT_EXPORT_BATCH_SIZE, ItemResultFilter, fetch_item_results, insert_scores, iter_item_results
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PERCENTILES = (10, 25, 50, 75, 90, 99)
+HISTOGRAM_BINS = 10
+
+# Runs whose EvaluationScore rows are known to be populated in this process
+_backfilled: Set[int] = set()
+
+
+def backfill_scores(run_id: int) -> int:
+    """Populate EvaluationScore rows for results written before the score table existed.
+
+    Returns the number of rows inserted. Only metrics without any score row for the run are copied
+    from ``scores_json``, so a legacy run that later gained metrics still gets its older ones.
+    """
+    if run_id in _backfilled:
+        return 0
+    with get_session() as session:
+        # Score rows are written in the same transaction as their item, so a metric is either complete or absent
+        present = set(session.exec(select(EvaluationScore.metric).where(EvaluationScore.run_id == run_id).distinct()))
+        run_metrics = session.exec(select(EvaluationRun.metrics_json).where(EvaluationRun.id == run_id)).first()
+    inserted = 0
+    if run_metrics is None or set(json.loads(run_metrics)) - present:
+        batch: List[Dict[str, Any]] = []
+        for it in iter_item_results(run_id):
+            for metric, score in json.loads(it.scores_json or "{}").items():
+                if metric not in present:
+                    batch.append(dict(run_id=run_id, item_index=it.item_index, metric=metric, score=float(score)))
+            if len(batch) >= RESULT_EXPORT_BATCH_SIZE:
+                insert_scores(batch)
+                inserted += len(batch)
+                batch = []
+        if batch:
+            insert_scores(batch)
+            inserted += len(batch)
+        if inserted:
+            logger.info("Run %s: backfilled %d score rows from scores_json", run_id, inserted)
+    _backfilled.add(run_id)
+    return inserted
+
+
+def _score_column(run_id: int, metric: str) -> Any:
+    import numpy as np
+
+    with get_session() as session:
+        rows = session.exec(
+            select(EvaluationScore.score)
+            .where(EvaluationScore.run_id == run_id, EvaluationScore.metric == metric)
+            .execution_options(yield_per=10000)
+        )
+        return np.fromiter(rows, dtype=np.float64)
+
+
+def score_summary(run_id: int, metrics: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Per-metric count, mean, min/max, stddev, percentiles and a histogram over [0, 1], computed in NumPy.
+
+    Every statistic of a metric comes from one read of its score column, so they stay consistent
+    while a running run keeps adding rows.
+    """
+    import numpy as np
+
+    summary: Dict[str, Dict[str, Any]] = {}
+    for metric in metrics:
+        scores = _score_column(run_id, metric)
+        count = len(scores)
+        stats: Dict[str, Any] = {"count": count, "mean": None, "min": None, "max": None, "stddev": None}
+        stats.update({f"p{q}": None for q in SUMMARY_PERCENTILES})
+        stats["histogram"] = [0] * HISTOGRAM_BINS
+        if count:
+            stats.update(mean=float(scores.mean()), min=float(scores.min()), max=float(scores.max()))
+            stats["stddev"] = float(scores.std(ddof=1)) if count > 1 else 0.0
+            for q, value in zip(SUMMARY_PERCENTILES, np.percentile(scores, SUMMARY_PERCENTILES)):
+                stats[f"p{q}"] = float(value)
+            hist, _ = np.histogram(np.clip(scores, 0.0, 1.0), bins=HISTOGRAM_BINS, range=(0.0, 1.0))
+            stats["histogram"] = hist.tolist()
+        summary[metric] = stats
+    return summary
+
+
+def write_parquet(run_id: int, metrics: List[str], path: str, filters: Optional[ItemResultFilter] = None) -> int:
+    """Write a run's results to Parquet with one float column per metric; returns the number of rows.
+
+    Rows are written one keyset page at a time, with scores read from the score table, so memory
+    stays bounded by the page size. Requires the optional ``pyarrow`` package.
+    """
+    import pyarrow as pa  # type: ignore
+    import pyarrow.parquet as pq  # type: ignore
+
+    schema = pa.schema(
+        [
+            ("item_index", pa.int64()),
+            ("input_text", pa.string()),
+            ("reference_text", pa.string()),
+            ("output_text", pa.string()),
+            ("error_message", pa.string()),
+        ]
+        + [(metric, pa.float64()) for metric in metrics]
+    )
+    written = 0
+    after: Optional[int] = None
+    with pq.ParquetWriter(path, schema) as writer:
+        while True:
+            page = fetch_item_results(run_id, after=after, limit=RESULT_EXPORT_BATCH_SIZE, filters=filters)
+            if not page:
+                break
+            first, last = page[0].item_index, page[-1].item_index
+            with get_session() as session:
+                score_rows = session.exec(
+                    select(EvaluationScore.item_index, EvaluationScore.metric, EvaluationScore.score).where(
+                        EvaluationScore.run_id == run_id,
+                        EvaluationScore.item_index >= first,
+                        EvaluationScore.item_index <= last,
+                    )
+                ).all()
+            scores: Dict[str, Dict[int, float]] = {metric: {} for metric in metrics}
+            for item_index, metric, score in score_rows:
+                if metric in scores:
+                    scores[metric][item_index] = score
+            columns: Dict[str, List[Any]] = {
+                "item_index": [it.item_index for it in page],
+                "input_text": [it.input_text for it in page],
+                "reference_text": [it.reference_text for it in page],
+                "output_text": [it.output_text for it in page],
+                "error_message": [it.error_message for it in page],
+            }
+            for metric in metrics:
+                columns[metric] = [scores[metric].get(it.item_index) for it in page]
+            writer.write_table(pa.table(columns, schema=schema))
+            written += len(page)
+            if len(page) < RESULT_EXPORT_BATCH_SIZE:
+                break
+            after = last
+    return written
+
+
+# Completed-run comparisons keyed by their inputs (including each run's updated_at, so re-scored runs miss)
+COMPARISON_CACHE_SIZE = int(os.getenv("COMPARISON_CACHE_SIZE", "64"))
+_comparison_cache: "OrderedDict[Tuple[Any, ...], Dict[str, Any]]" = OrderedDict()
+_comparison_lock = threading.Lock()
+
+# Upper bound on resampled indexes materialised at once by the index bootstrap
+_BOOTSTRAP_CHUNK_ELEMENTS = 4_000_000
+
+
+def _paired_scores(base_id: int, candidate_id: int, metric: str) -> Tuple[Any, Any, Any]:
+    import numpy as np
+
+    candidate = aliased(EvaluationScore)
+    with get_session() as session:
+        rows = session.execute(
+            select(EvaluationScore.item_index, EvaluationScore.score, candidate.score)
+            .join(
+                candidate,
+                and_(
+                    candidate.run_id == candidate_id,
+                    candidate.metric == EvaluationScore.metric,
+                    candidate.item_index == EvaluationScore.item_index,
+                ),
+            )
+            .where(EvaluationScore.run_id == base_id, EvaluationScore.metric == metric)
+        ).all()
+    # Transposing to plain columns first is far cheaper than np.array over Row objects
+    items, base, candidate = zip(*rows) if rows else ((), (), ())
+    return np.array(items, dtype=np.int64), np.array(base, dtype=np.float64), np.array(candidate, dtype=np.float64)
+
+
+def bootstrap_mean_ci(diffs: Any, n_boot: int, confidence: float, seed: int) -> Tuple[float, float]:
+    """Percentile bootstrap interval for the mean of paired differences.
+
+    When the differences take few distinct values (judge scores, exact match), each replicate is drawn
+    as multinomial counts over those values, which is exact and costs O(distinct) instead of O(n).
+    Otherwise indexes are resampled in chunks to bound memory.
+    """
+    import numpy as np
+
+    n = len(diffs)
+    if n == 0:
+        return float("nan"), float("nan")
+    rng = np.random.default_rng(seed)
+    values, counts = np.unique(diffs, return_counts=True)
+    if len(values) * 4 <= n:
+        draws = rng.multinomial(n, counts / n, size=n_boot)
+        means = draws @ values / n
+    else:
+        means = np.empty(n_boot)
+        step = max(1, _BOOTSTRAP_CHUNK_ELEMENTS // n)
+        for start in range(0, n_boot, step):
+            size = min(step, n_boot - start)
+            means[start : start + size] = diffs[rng.integers(0, n, size=(size, n))].mean(axis=1)
+    alpha = (1.0 - confidence) / 2.0
+    low, high = np.quantile(means, [alpha, 1.0 - alpha])
+    return float(low), float(high)
+
+
+def compare_runs(
+    base_id: int,
+    candidate_id: int,
+    metrics: List[str],
+    n_boot: int = 1000,
+    confidence: float = 0.95,
+    top_k: int = 10,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """Per-metric paired comparison of two runs over the items both of them scored."""
+    import numpy as np
+
+    comparison: Dict[str, Any] = {}
+    regressions: Dict[str, List[Dict[str, Any]]] = {}
+    regressed_indexes: Set[int] = set()
+    for metric in metrics:
+        items, base, candidate = _paired_scores(base_id, candidate_id, metric)
+        diffs = candidate - base
+        n = len(diffs)
+        low, high = bootstrap_mean_ci(diffs, n_boot, confidence, seed)
+        delta = float(diffs.mean()) if n else None
+        comparison[metric] = {
+            "n": n,
+            "base_mean": float(base.mean()) if n else None,
+            "candidate_mean": float(candidate.mean()) if n else None,
+            "delta": delta,
+            "ci_low": low if n else None,
+            "ci_high": high if n else None,
+            # The interval excludes zero: the change is unlikely to be resampling noise
+            "significant": bool(n and (low > 0 or high < 0)),
+            "improved": int((diffs > 0).sum()),
+            "regressed": int((diffs < 0).sum()),
+            "unchanged": int((diffs == 0).sum()),
+        }
+        worst = np.flatnonzero(diffs < 0)
+        if len(worst) > top_k:
+            worst = worst[np.argpartition(diffs[worst], top_k)[:top_k]]
+        worst = worst[np.argsort(diffs[worst], kind="stable")]
+        regressions[metric] = [
+            {
+                "item_index": int(items[i]),
+                "base_score": float(base[i]),
+                "candidate_score": float(candidate[i]),
+                "delta": float(diffs[i]),
+            }
+            for i in worst
+        ]
+        regressed_indexes.update(int(items[i]) for i in worst)
+
+    if regressed_indexes:
+        with get_session() as session:
+            inputs = dict(
+                session.exec(
+                    select(EvaluationItemResult.item_index, EvaluationItemResult.input_text).where(
+                        EvaluationItemResult.run_id == base_id,
+                        EvaluationItemResult.item_index.in_(regressed_indexes),
+                    )
+                ).all()
+            )
+        for entries in regressions.values():
+            for entry in entries:
+                entry["input_text"] = inputs.get(entry["item_index"])
+    return {"metrics": comparison, "top_regressions": regressions}
+
+
+def cached_compare_runs(cache_key: Tuple[Any, ...], *args: Any, **kwargs: Any) -> Dict[str, Any]:
+    with _comparison_lock:
+        cached = _comparison_cache.get(cache_key)
+        if cached is not None:
+            _comparison_cache.move_to_end(cache_key)
+            return cached
+    result = compare_runs(*args, **kwargs)
+    with _comparison_lock:
+        _comparison_cache[cache_key] = result
+        while len(_comparison_cache) > max(0, COMPARISON_CACHE_SIZE):
+            _comparison_cache.popitem(last=False)
+    return result
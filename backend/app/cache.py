@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Dict, Optional
+
+# Per-run opt-out; asyncio.to_thread copies the context so provider calls made from worker threads see it
+cache_enabled: ContextVar[bool] = ContextVar("generation_cache_enabled", default=True)
+
+DEFAULT_CACHE_PATH = Path(__file__).resolve().parent.parent / "data" / "generation_cache.sqlite"
+CACHE_PATH = os.getenv("GENERATION_CACHE_PATH", str(DEFAULT_CACHE_PATH))
+CACHE_MAX_BYTES = int(float(os.getenv("GENERATION_CACHE_MAX_MB", "512")) * 1024 * 1024)
+CACHE_DISABLED = os.getenv("GENERATION_CACHE_DISABLED", "").lower() in {"1", "true", "yes"}
+# Hits refresh last_access at most this often, so repeated reads of a hot entry stay read-only
+TOUCH_INTERVAL_S = 60.0
+
+
+def make_cache_key(provider: str, model_name: str, temperature: float, top_p: float, max_tokens: int, prompt: str) -> str:
+    payload = json.dumps([provider, model_name, float(temperature), float(top_p), int(max_tokens), prompt], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class GenerationCache:
+    """Content-addressed SQLite store of model outputs with size-based LRU eviction."""
+
+    def __init__(self, path: str, max_bytes: int) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS generations ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_generations_last_access ON generations (last_access)")
+        row = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM generations").fetchone()
+        self._total_bytes = int(row[0])
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value, last_access FROM generations WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            now = time.time()
+            if now - float(row[1]) >= TOUCH_INTERVAL_S:
+                self._conn.execute("UPDATE generations SET last_access = ? WHERE key = ?", (now, key))
+            return str(row[0])
+
+    def set(self, key: str, value: str) -> None:
+        size = len(value.encode("utf-8")) + len(key)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM generations WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO generations (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, size, time.time()),
+            )
+            self._total_bytes += size - (int(old[0]) if old else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        # Trim to 90% of the cap so eviction is not re-triggered on every insert
+        target = int(self.max_bytes * 0.9)
+        while self._total_bytes > target:
+            rows = self._conn.execute(
+                "SELECT key, size FROM generations ORDER BY last_access ASC LIMIT 256"
+            ).fetchall()
+            if not rows:
+                self._total_bytes = 0
+                return
+            self._conn.execute("BEGIN")
+            for key, size in rows:
+                self._conn.execute("DELETE FROM generations WHERE key = ?", (key,))
+                self._total_bytes -= int(size)
+                self.evictions += 1
+                if self._total_bytes <= target:
+                    break
+            self._conn.execute("COMMIT")
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM generations").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "entries": int(entries),
+                "size_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
+
+
+_cache: Optional[GenerationCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> Optional[GenerationCache]:
+    global _cache
+    if CACHE_DISABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = GenerationCache(CACHE_PATH, CACHE_MAX_BYTES)
+    return _cache
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import operator
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Deterministic metrics scored before any judge call; cascade rules test these
+CHEAP_METRICS = ("exact_match", "bleu", "rougeL", "semantic_similarity", "data_validation")
+
+OPERATORS: Dict[str, Callable[[float, float], bool]] = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+
+@dataclass
+class CascadeRule:
+    """When ``metric`` (a cheap metric) satisfies ``op value``, set the ``derive`` scores and leave the
+    ``skip`` metrics unscored instead of calling the judge for them."""
+
+    metric: str
+    op: str
+    value: float
+    derive: Dict[str, float] = field(default_factory=dict)
+    skip: List[str] = field(default_factory=list)
+
+    def matches(self, scores: Dict[str, float]) -> bool:
+        score = scores.get(self.metric)
+        return score is not None and OPERATORS[self.op](score, self.value)
+
+    def describe(self) -> str:
+        return f"{self.metric} {self.op} {self.value:g}"
+
+
+class MetricCascade:
+    """Ordered cascade rules; the first matching rule that names a metric decides it."""
+
+    def __init__(self, rules: Iterable[CascadeRule]) -> None:
+        self.rules = list(rules)
+
+    @classmethod
+    def from_list(cls, values: List[Dict[str, Any]]) -> "MetricCascade":
+        return cls(
+            CascadeRule(
+                metric=v["metric"],
+                op=v.get("op", ">="),
+                value=float(v["value"]),
+                derive={k: float(s) for k, s in (v.get("derive") or {}).items()},
+                skip=list(v.get("skip") or []),
+            )
+            for v in values
+        )
+
+    def decide(self, scores: Dict[str, float], names: Iterable[str]) -> Dict[str, Tuple[Optional[float], str]]:
+        """Metrics of ``names`` not in ``scores`` that a rule decides: metric -> (derived score or None
+        when skipped, the rule)."""
+        pending = {m for m in names if m not in scores}
+        decided: Dict[str, Tuple[Optional[float], str]] = {}
+        for rule in self.rules:
+            if not pending or not rule.matches(scores):
+                continue
+            for name, value in rule.derive.items():
+                if name in pending:
+                    decided[name] = (value, rule.describe())
+                    pending.discard(name)
+            for name in rule.skip:
+                if name in pending:
+                    decided[name] = (None, rule.describe())
+                    pending.discard(name)
+        return decided
@@ -0,0 +1,377 @@
+from __future__ import annotations
+
+import csv
+import io
+import itertools
+import json
+import mmap
+import os
+import random
+from array import array
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+SUPPORTED_EXTENSIONS = {".jsonl", ".json", ".csv"}
+
+
+class DatasetValidationError(ValueError):
+    def __init__(self, line: int, message: str) -> None:
+        super().__init__(f"line {line}: {message}")
+        self.line = line
+        self.message = message
+
+
+def index_path_for(storage_path: str) -> str:
+    return f"{storage_path}.idx"
+
+
+class DatasetIndexBuilder:
+    """Validates a JSONL/CSV dataset fed in byte chunks and records the byte offset of every row.
+
+    Rows are checked as they complete, so a malformed record is reported with its line number
+    without buffering more than the current line (or quoted CSV record) in memory.
+    """
+
+    def __init__(self, fmt: str) -> None:
+        if fmt not in {"jsonl", "csv"}:
+            raise ValueError(f"Unsupported dataset format: {fmt}")
+        self.fmt = fmt
+        self.offsets = array("Q")
+        self.bytes_seen = 0
+        self._pending = bytearray()
+        self._pending_start = 0  # byte offset of the first byte in _pending
+        self._line_no = 0  # physical lines consumed so far
+        self._record = bytearray()  # CSV record spanning several physical lines
+        self._in_quotes = False  # the CSV record so far ends inside a quoted field
+        self._record_start = 0
+        self._record_line = 0
+        self._header: Optional[List[str]] = None
+
+    @classmethod
+    def for_filename(cls, filename: str) -> "DatasetIndexBuilder":
+        ext = Path(filename).suffix.lower()
+        if ext not in SUPPORTED_EXTENSIONS:
+            raise ValueError("Unsupported file type. Use .jsonl or .csv")
+        return cls("csv" if ext == ".csv" else "jsonl")
+
+    @property
+    def num_items(self) -> int:
+        return len(self.offsets)
+
+    def feed(self, chunk: bytes) -> None:
+        self.bytes_seen += len(chunk)
+        self._pending += chunk
+        start = 0
+        while True:
+            nl = self._pending.find(b"\n", start)
+            if nl == -1:
+                break
+            self._consume_line(bytes(self._pending[start : nl + 1]), self._pending_start + start)
+            start = nl + 1
+        if start:
+            del self._pending[:start]
+            self._pending_start += start
+
+    def finish(self) -> None:
+        if self._pending:
+            line = bytes(self._pending)
+            self._pending.clear()
+            self._consume_line(line, self._pending_start)
+            self._pending_start += len(line)
+        if self._record:
+            raise DatasetValidationError(self._record_line, "unterminated quoted field")
+        if self.fmt == "csv" and self._header is None:
+            raise DatasetValidationError(1, "missing CSV header row")
+
+    def write_index(self, path: str) -> None:
+        with open(path, "wb") as f:
+            self.offsets.tofile(f)
+
+    def _decode(self, raw: bytes, line_no: int) -> str:
+        try:
+            # utf-8-sig drops a BOM on the first line; it is a no-op elsewhere
+            return raw.decode("utf-8-sig" if line_no == 1 else "utf-8")
+        except UnicodeDecodeError as e:
+            raise DatasetValidationError(line_no, f"invalid UTF-8: {e.reason}") from None
+
+    def _consume_line(self, raw: bytes, offset: int) -> None:
+        self._line_no += 1
+        if self.fmt == "jsonl":
+            self._consume_jsonl(raw, offset)
+        else:
+            self._consume_csv(raw, offset)
+
+    def _consume_jsonl(self, raw: bytes, offset: int) -> None:
+        text = self._decode(raw, self._line_no)
+        if not text.strip():
+            return
+        try:
+            obj = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise DatasetValidationError(self._line_no, f"invalid JSON: {e.msg}") from None
+        if not isinstance(obj, dict):
+            raise DatasetValidationError(self._line_no, "expected a JSON object")
+        if "input" not in obj:
+            raise DatasetValidationError(self._line_no, "missing required key 'input'")
+        self.offsets.append(offset)
+
+    def _consume_csv(self, raw: bytes, offset: int) -> None:
+        if not self._record:
+            if not raw.strip():
+                return
+            self._record_start = offset
+            self._record_line = self._line_no
+        self._record += raw
+        if (b'"' in raw or self._in_quotes) and self._scan_quotes(raw):
+            return
+        record, self._record = bytes(self._record), bytearray()
+        text = self._decode(record, self._record_line)
+        try:
+            fields = next(csv.reader(io.StringIO(text, newline="")))
+        except (csv.Error, StopIteration) as e:
+            raise DatasetValidationError(self._record_line, f"invalid CSV record: {e}") from None
+        if self._header is None:
+            if "input" not in fields:
+                raise DatasetValidationError(self._record_line, "CSV header must include an 'input' column")
+            self._header = fields
+            return
+        if len(fields) != len(self._header):
+            raise DatasetValidationError(
+                self._record_line, f"expected {len(self._header)} fields, got {len(fields)}"
+            )
+        self.offsets.append(self._record_start)
+
+    def _scan_quotes(self, raw: bytes) -> bool:
+        # Whether the record continues on the next line. As in the csv module, a quote only opens a
+        # quoted field as the first character of a field, and "" inside one is an escaped quote.
+        in_quotes = self._in_quotes
+        i = 0
+        while True:
+            j = raw.find(b'"', i)
+            if j == -1:
+                break
+            if in_quotes:
+                if raw[j + 1 : j + 2] == b'"':
+                    i = j + 2
+                    continue
+                in_quotes = False
+            elif j == 0 or raw[j - 1] == 0x2C:
+                # A line read outside quotes starts a new record, so position 0 is a field start
+                in_quotes = True
+            i = j + 1
+        self._in_quotes = in_quotes
+        return in_quotes
+
+
+class DatasetIndex:
+    """Read-only view of a ``.idx`` sidecar, memory-mapped so opening it costs O(1) regardless of size."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._mmap: Optional[mmap.mmap] = None
+        self._offsets: Sequence[int] = ()
+        if size:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._offsets = memoryview(self._mmap).cast("Q")
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def __getitem__(self, i: int) -> int:
+        return self._offsets[i]
+
+    def close(self) -> None:
+        if isinstance(self._offsets, memoryview):
+            self._offsets.release()
+        self._offsets = ()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._file.close()
+
+    def __enter__(self) -> "DatasetIndex":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+def build_index(storage_path: str, index_path: Optional[str] = None) -> str:
+    """Index an already stored dataset (e.g. uploaded before indexes existed) and return the sidecar path."""
+    index_path = index_path or index_path_for(storage_path)
+    builder = DatasetIndexBuilder.for_filename(storage_path)
+    with open(storage_path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            builder.feed(chunk)
+    builder.finish()
+    builder.write_index(index_path)
+    return index_path
+
+
+def shard_bounds(num_items: int, shard: int, num_shards: int) -> Tuple[int, int]:
+    """Contiguous ``[start, stop)`` row range of one of ``num_shards`` disjoint, near-equal shards."""
+    if num_shards < 1 or not 0 <= shard < num_shards:
+        raise ValueError(f"Invalid shard {shard} of {num_shards}")
+    base, extra = divmod(num_items, num_shards)
+    start = shard * base + min(shard, extra)
+    return start, start + base + (1 if shard < extra else 0)
+
+
+def parse_item(obj: Dict[str, Any]) -> Dict[str, str]:
+    return {
+        "input": str(obj.get("input", "")),
+        "reference": str(obj.get("reference", "")) if obj.get("reference") is not None else "",
+    }
+
+
+class DatasetReader:
+    """Random and range access to dataset rows through a byte-offset index."""
+
+    def __init__(self, storage_path: str, index: DatasetIndex) -> None:
+        self.storage_path = storage_path
+        self.index = index
+        self.is_csv = Path(storage_path).suffix.lower() == ".csv"
+        self._header: Optional[List[str]] = None
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def close(self) -> None:
+        self.index.close()
+
+    def _csv_header(self, f: BinaryIO) -> List[str]:
+        if self._header is None:
+            f.seek(0)
+            text = io.TextIOWrapper(f, encoding="utf-8-sig", newline="")
+            try:
+                self._header = next(csv.reader(text))
+            finally:
+                text.detach()
+        return self._header
+
+    def iter_range(self, start: int = 0, stop: Optional[int] = None) -> Iterator[Tuple[int, Dict[str, str]]]:
+        """Yield ``(item_index, item)`` for rows ``[start, stop)``, seeking straight to ``start``."""
+        stop = len(self.index) if stop is None else min(stop, len(self.index))
+        if start >= stop:
+            return
+        with open(self.storage_path, "rb") as f:
+            header = self._csv_header(f) if self.is_csv else None
+            f.seek(self.index[start])
+            # utf-8-sig skips a BOM when row 0 starts the file and is a no-op at any other offset
+            text = io.TextIOWrapper(f, encoding="utf-8-sig", newline="" if self.is_csv else None)
+            if header is not None:
+                records: Iterator[Dict[str, Any]] = csv.DictReader(text, fieldnames=header)
+            else:
+                records = (json.loads(line) for line in text if line.strip())
+            for index, obj in zip(range(start, stop), records):
+                yield index, parse_item(obj)
+
+    def read_item(self, index: int) -> Dict[str, str]:
+        for _, item in self.iter_range(index, index + 1):
+            return item
+        raise IndexError(index)
+
+    def iter_indices(self, indices: Iterable[int]) -> Iterator[Tuple[int, Dict[str, str]]]:
+        """Yield ``(item_index, item)`` for rows in the given order, seeking to each through one open file."""
+        with open(self.storage_path, "rb") as f:
+            header = self._csv_header(f) if self.is_csv else None
+            for index in indices:
+                f.seek(self.index[int(index)])
+                text = io.TextIOWrapper(f, encoding="utf-8-sig", newline="" if self.is_csv else None)
+                try:
+                    if header is not None:
+                        obj: Dict[str, Any] = next(csv.DictReader(text, fieldnames=header))
+                    else:
+                        obj = json.loads(text.readline())
+                finally:
+                    text.detach()
+                yield int(index), parse_item(obj)
+
+
+def open_reader(storage_path: str, index_path: Optional[str]) -> Optional[DatasetReader]:
+    """Open a reader over the dataset's index, building the index if it is missing.
+
+    Returns None for legacy files the index builder rejects; those can still be read sequentially.
+    """
+    if not index_path or not os.path.exists(index_path):
+        try:
+            index_path = build_index(storage_path, index_path)
+        except (DatasetValidationError, ValueError):
+            return None
+    return DatasetReader(storage_path, DatasetIndex(index_path))
+
+
+def _iter_sequential(storage_path: str) -> Iterator[Dict[str, Any]]:
+    suffix = Path(storage_path).suffix.lower()
+    if suffix in {".jsonl", ".json"}:
+        with open(storage_path, "r", encoding="utf-8-sig") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                yield json.loads(line)
+    elif suffix == ".csv":
+        with open(storage_path, newline="", encoding="utf-8-sig") as csvfile:
+            yield from csv.DictReader(csvfile)
+    else:
+        raise ValueError("Unsupported dataset format. Use JSONL with keys 'input' and 'reference' or CSV with same headers.")
+
+
+def iter_dataset_items(
+    storage_path: str,
+    reader: Optional[DatasetReader] = None,
+    offset: int = 0,
+    stop: Optional[int] = None,
+    limit: Optional[int] = None,
+    sample_fraction: Optional[float] = None,
+    sample_seed: int = 0,
+) -> Iterator[Tuple[int, Dict[str, str]]]:
+    """Yield ``(item_index, item)`` pairs without reading the whole file into memory.
+
+    ``item_index`` is the row's position in the dataset, so it is stable across offsets and sampling.
+    Rows outside ``[offset, stop)`` are skipped (by seeking, when an index reader is given), each
+    remaining row is kept with probability ``sample_fraction`` (seeded), and iteration stops after
+    ``limit`` kept rows.
+    """
+    if reader is not None:
+        rows: Iterator[Tuple[int, Dict[str, Any]]] = reader.iter_range(offset, stop)
+    else:
+        rows = itertools.islice(enumerate(_iter_sequential(storage_path)), offset, stop)
+
+    rng = random.Random(sample_seed) if sample_fraction is not None and sample_fraction < 1.0 else None
+    emitted = 0
+    for index, obj in rows:
+        if limit is not None and emitted >= limit:
+            return
+        if rng is not None and rng.random() >= sample_fraction:
+            continue
+        emitted += 1
+        yield index, parse_item(obj)
+
+
+def shuffled_item_order(
+    num_rows: int,
+    offset: int = 0,
+    stop: Optional[int] = None,
+    limit: Optional[int] = None,
+    sample_fraction: Optional[float] = None,
+    sample_seed: int = 0,
+    order_seed: int = 0,
+) -> Any:
+    """Indexes of the rows ``iter_dataset_items`` would yield for the same arguments, in a seeded random order.
+
+    Selection (range, sampling, limit) is identical, so a run processed in random order covers
+    exactly the rows of a sequential one. Returns a NumPy array.
+    """
+    import numpy as np
+
+    stop = num_rows if stop is None else min(stop, num_rows)
+    rows = np.arange(offset, max(stop, offset), dtype=np.int64)
+    if sample_fraction is not None and sample_fraction < 1.0:
+        # Same draws, in the same row order, as iter_dataset_items
+        rng = random.Random(sample_seed)
+        rows = rows[np.fromiter((rng.random() < sample_fraction for _ in range(len(rows))), dtype=bool, count=len(rows))]
+    if limit is not None:
+        rows = rows[:limit]
+    return np.random.default_rng(order_seed).permutation(rows)
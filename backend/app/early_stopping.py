@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass, field
+from statistics import NormalDist
+from typing import Any, Dict, List, Optional, Tuple
+
+from .progress import MetricStats, RunProgress
+
+
+def confidence_interval(stats: MetricStats, confidence: float, population: Optional[int] = None) -> Optional[Tuple[float, float]]:
+    """Normal-approximation interval for the mean of scores in [0, 1].
+
+    One pseudo-observation at 0 and one at 1 are added before computing the variance, so a metric
+    whose first items all scored the same does not get a zero-width interval. With ``population``
+    (items the run would score in total) the finite population correction narrows the interval as
+    the run approaches it.
+    """
+    n = stats.count
+    if n < 2:
+        return None
+    total = stats.mean * n + 1.0
+    squares = stats.sum_of_squares + 1.0
+    adjusted_n = n + 2
+    variance = max(squares - total * total / adjusted_n, 0.0) / (adjusted_n - 1)
+    se = math.sqrt(variance / n)
+    if population is not None and population > 1:
+        se *= math.sqrt(max(population - n, 0) / (population - 1))
+    half = NormalDist().inv_cdf(0.5 + confidence / 2) * se
+    return stats.mean - half, stats.mean + half
+
+
+@dataclass
+class EarlyStoppingRule:
+    """Stop once every watched metric is decided: its interval is at most ``ci_width`` wide, or lies
+    entirely above or below the metric's pass/fail threshold."""
+
+    metrics: List[str]
+    ci_width: Optional[float] = None
+    thresholds: Dict[str, float] = field(default_factory=dict)
+    confidence: float = 0.95
+    min_items: int = 200
+
+    @classmethod
+    def from_dict(cls, values: Dict[str, Any], run_metrics: List[str]) -> "EarlyStoppingRule":
+        thresholds = {k: float(v) for k, v in (values.get("thresholds") or {}).items() if k in run_metrics}
+        ci_width = values.get("ci_width")
+        watched = values.get("metrics") or (run_metrics if ci_width else list(thresholds))
+        return cls(
+            metrics=[m for m in watched if m in run_metrics],
+            ci_width=ci_width,
+            thresholds=thresholds,
+            confidence=float(values.get("confidence", 0.95)),
+            min_items=int(values.get("min_items", 200)),
+        )
+
+    def evaluate(self, progress: RunProgress) -> Tuple[bool, Dict[str, Any]]:
+        """Return whether the run can stop, and each watched metric's interval and decision."""
+        details: Dict[str, Any] = {}
+        decided_all = bool(self.metrics)
+        for name in self.metrics:
+            stats = progress.metrics.get(name)
+            interval = confidence_interval(stats, self.confidence, progress.total) if stats is not None else None
+            decision = None
+            if interval is not None and stats is not None and stats.count >= self.min_items:
+                low, high = interval
+                threshold = self.thresholds.get(name)
+                if threshold is not None and low > threshold:
+                    decision = "pass"
+                elif threshold is not None and high < threshold:
+                    decision = "fail"
+                elif self.ci_width is not None and high - low <= self.ci_width:
+                    decision = "converged"
+            details[name] = {
+                "n": stats.count if stats is not None else 0,
+                "ci_low": interval[0] if interval else None,
+                "ci_high": interval[1] if interval else None,
+                "decision": decision,
+            }
+            decided_all = decided_all and decision is not None
+        return decided_all, details
@@ -1,132 +1,549 @@
 from __future__ import annotations
 
 import asyncio
+import itertools
 import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, Iterator, List, Optional, Set, Tuple, TypeVar
 
-from .database import get_session
-from .metrics import METRICS_REGISTRY
-from .model_provider import ModelProvider
+from sqlmodel import select
+
+from .cache import cache_enabled
+from .cascade import MetricCascade
+from .database import get_async_session, get_session
+from .early_stopping import EarlyStoppingRule
+from .datasets import iter_dataset_items, open_reader, shard_bounds, shuffled_item_order
+from .batching import MicroBatcher
+from .metrics import (
+    ASYNC_METRICS_REGISTRY,
+    BATCH_METRICS_REGISTRY,
+    EMBEDDING_BATCH_SIZE,
+    JUDGE_METRICS,
+    JudgeMultiError,
+    METRICS_REGISTRY,
+    ajudge_multi,
+    judge_override,
+    reference_cache,
+    score_batch_timed,
+    semantic_similarity_cached,
+    structural_data_validation,
+)
+from .metrics.semantic import ReferenceEmbeddingCache
+from .metrics.llm_judge import JUDGE_MODEL, JUDGE_PROVIDER
+from .model_provider import get_provider
 from .models import Dataset, EvaluationItemResult, EvaluationRun
+from .generations import GenerationStore, generation_config_hash
+from .persistence import ResultWriter, iter_item_results
+from .progress import PROGRESS_PERSIST_INTERVAL_S, RunProgress
+from .rate_limit import configure_provider_limits, settings_from_dict
+from .telemetry import Telemetry, observe, run_telemetry, thread_pool_queue_depth, timed
 
+logger = logging.getLogger(__name__)
 
-DATA_DIR = Path(__file__).resolve().parent.parent / "data" / "datasets"
+T = TypeVar("T")
 
+# Rows handed from the file reader to the worker pool per read
+LOAD_CHUNK_SIZE = 256
 
-def _load_dataset_items(storage_path: str) -> List[Dict[str, str]]:
-    path = Path(storage_path)
-    items: List[Dict[str, str]] = []
-    if path.suffix.lower() in {".jsonl", ".json"}:
-        with open(path, "r", encoding="utf-8") as f:
-            for line in f:
-                if not line.strip():
-                    continue
-                obj = json.loads(line)
-                items.append({
-                    "input": str(obj.get("input", "")),
-                    "reference": str(obj.get("reference", "")) if obj.get("reference") is not None else "",
-                })
-    elif path.suffix.lower() == ".csv":
-        import csv
-
-        with open(path, newline="", encoding="utf-8") as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                items.append({
-                    "input": str(row.get("input", "")),
-                    "reference": str(row.get("reference", "")) if row.get("reference") is not None else "",
-                })
+# Lexical metrics are scored in chunks of up to this many items; items arriving while a chunk is being
+# scored join the next one, so chunks grow with load without a fixed wait window
+LEXICAL_BATCH_SIZE = int(os.getenv("LEXICAL_BATCH_SIZE", "256"))
+# >0 fans lexical chunks out to a process pool of this size instead of a single worker thread
+LEXICAL_METRIC_PROCESSES = int(os.getenv("LEXICAL_METRIC_PROCESSES", "0"))
+
+_lexical_pool: Optional[ProcessPoolExecutor] = None
+
+
+async def _score_lexical_chunk(
+    metric_names: List[str], items: List[Tuple[str, str, str]]
+) -> List[Dict[str, float]]:
+    global _lexical_pool
+    references, predictions, inputs = (list(column) for column in zip(*items))
+    if LEXICAL_METRIC_PROCESSES > 0:
+        if _lexical_pool is None:
+            _lexical_pool = ProcessPoolExecutor(max_workers=LEXICAL_METRIC_PROCESSES)
+        loop = asyncio.get_running_loop()
+        by_metric, seconds = await loop.run_in_executor(
+            _lexical_pool, score_batch_timed, metric_names, references, predictions, inputs
+        )
     else:
-        raise ValueError("Unsupported dataset format. Use JSONL with keys 'input' and 'reference' or CSV with same headers.")
-    return items
+        by_metric, seconds = await asyncio.to_thread(score_batch_timed, metric_names, references, predictions, inputs)
+    for name, elapsed in seconds.items():
+        # Amortised per item, so batched metrics are comparable with per-item ones
+        observe("metric", name, elapsed / len(items), count=len(items))
+    return [{name: float(by_metric[name][i]) for name in metric_names} for i in range(len(items))]
+
+
+async def _score_semantic_chunk(cache: ReferenceEmbeddingCache, items: List[Tuple[int, str, str]]) -> List[float]:
+    indices, references, predictions = (list(column) for column in zip(*items))
+    started = time.perf_counter()
+    scores = await asyncio.to_thread(semantic_similarity_cached, cache, indices, references, predictions)
+    observe("metric", "semantic_similarity", (time.perf_counter() - started) / len(items), count=len(items))
+    return scores
+
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data" / "datasets"
+
+
+def _take(iterator: Iterator[T], n: int) -> List[T]:
+    return list(itertools.islice(iterator, n))
+
+
+# Runs executing in this process; guards against resuming a run that is still in flight
+_active_runs: Set[int] = set()
+
+
+# Progress and telemetry of the runs executing in this process, readable while they run
+_live_progress: Dict[int, RunProgress] = {}
+_live_telemetry: Dict[int, Telemetry] = {}
+
+
+def is_run_active(run_id: int) -> bool:
+    return run_id in _active_runs
+
+
+def get_live_progress(run_id: int) -> Optional[Dict[str, object]]:
+    progress = _live_progress.get(run_id)
+    return progress.snapshot() if progress is not None else None
+
+
+def live_run_progress() -> Dict[int, RunProgress]:
+    return dict(_live_progress)
+
+
+def get_live_telemetry(run_id: int) -> Optional[Dict[str, object]]:
+    telemetry = _live_telemetry.get(run_id)
+    return telemetry.summary() if telemetry is not None else None
+
+
+def _load_completed_items(
+    run_id: int, progress: RunProgress, pending_metrics: List[str]
+) -> Tuple[Set[int], Set[int], Set[int]]:
+    """Results persisted by an earlier attempt: their indexes are skipped and their scores seed the stats.
+
+    Also returns the indexes of stored items that have an output but lack one of ``pending_metrics``
+    (metrics added to the run after it scored them), which are rescored without generating again, and
+    of items whose generation failed, which are generated again and replace their stored row.
+    """
+    done: Set[int] = set()
+    rescore: Set[int] = set()
+    retry: Set[int] = set()
+    with get_session() as session:
+        rows = session.exec(
+            select(
+                EvaluationItemResult.item_index,
+                EvaluationItemResult.scores_json,
+                EvaluationItemResult.error_message,
+                EvaluationItemResult.output_text.is_not(None),
+                EvaluationItemResult.derived_json,
+            )
+            .where(EvaluationItemResult.run_id == run_id)
+            .execution_options(yield_per=5000)
+        )
+        for item_index, scores_json, error_message, has_output, derived_json in rows:
+            if error_message and not has_output:
+                retry.add(item_index)
+                continue
+            done.add(item_index)
+            scores = {name: float(value) for name, value in json.loads(scores_json or "{}").items()}
+            derived = json.loads(derived_json) if derived_json else {}
+            progress.restore(scores, bool(error_message), derived)
+            if has_output and any(m not in scores and m not in derived for m in pending_metrics):
+                rescore.add(item_index)
+    return done, rescore, retry
+
+
+async def _persist_progress(run_id: int, progress: RunProgress, telemetry: Telemetry) -> None:
+    async with get_async_session() as session:
+        run = await session.get(EvaluationRun, run_id)
+        if run is None or run.status != "running":
+            return
+        run.progress_json = json.dumps(progress.snapshot())
+        run.telemetry_json = json.dumps(telemetry.summary())
+        run.num_items = progress.completed
+        run.num_errors = progress.num_errors
+        run.updated_at = datetime.utcnow()
+        session.add(run)
+        await session.commit()
+
+
+async def _persist_progress_periodically(run_id: int, progress: RunProgress, telemetry: Telemetry) -> None:
+    while True:
+        await asyncio.sleep(PROGRESS_PERSIST_INTERVAL_S)
+        try:
+            await _persist_progress(run_id, progress, telemetry)
+        except Exception as e:
+            # Progress is advisory; a failed write must not abort the run
+            logger.warning("Run %s: could not persist progress: %r", run_id, e)
+
+
+def _expected_items(num_rows: Optional[int], start: int, stop: Optional[int], limit: Optional[int], sample_fraction: Optional[float]) -> Optional[int]:
+    if num_rows is None:
+        return None
+    span = max(min(stop if stop is not None else num_rows, num_rows) - start, 0)
+    if sample_fraction is not None:
+        # Sampling is random per row, so this is an estimate
+        span = round(span * sample_fraction)
+    return min(span, limit) if limit is not None else span
 
 
 async def run_evaluation_async(run_id: int) -> None:
+    """Run (or resume) an evaluation; items that already have a persisted result are skipped."""
+    if run_id in _active_runs:
+        return
+    _active_runs.add(run_id)
+    try:
+        await _run_evaluation(run_id)
+    finally:
+        _active_runs.discard(run_id)
+        _live_progress.pop(run_id, None)
+        _live_telemetry.pop(run_id, None)
+
+
+async def _run_evaluation(run_id: int) -> None:
     # Load run configuration
-    with get_session() as session:
-        run = session.get(EvaluationRun, run_id)
-        if run is None:
+    async with get_async_session() as session:
+        run = await session.get(EvaluationRun, run_id)
+        if run is None or run.status == "completed":
             return
         run.status = "running"
         run.updated_at = datetime.utcnow()
         session.add(run)
-        session.commit()
+        await session.commit()
 
+    # Stage timings, token usage and retries of this run, alongside the process-wide totals
+    telemetry = Telemetry()
+    run_telemetry.set(telemetry)
+    _live_telemetry[run_id] = telemetry
     try:
-        with get_session() as session:
-            run = session.get(EvaluationRun, run_id)
+        async with get_async_session() as session:
+            run = await session.get(EvaluationRun, run_id)
             assert run is not None
-            dataset = session.get(Dataset, run.dataset_id)
+            dataset = await session.get(Dataset, run.dataset_id)
             assert dataset is not None
-            items = _load_dataset_items(dataset.storage_path)
+            reader = await asyncio.to_thread(open_reader, dataset.storage_path, dataset.index_path)
+            if reader is not None and dataset.index_path != reader.index.path:
+                dataset.index_path = reader.index.path
+                session.add(dataset)
+                await session.commit()
+            start, stop = run.item_offset, None
+            num_rows = len(reader) if reader is not None else dataset.num_items
+            if run.num_shards > 1:
+                shard_start, stop = shard_bounds(num_rows, run.shard_index, run.num_shards)
+                start += shard_start
+            early_stopping = json.loads(run.early_stopping_json) if run.early_stopping_json else None
+            if early_stopping is not None and reader is not None:
+                # Random order makes every prefix of the run a simple random sample of its items
+                order = await asyncio.to_thread(
+                    shuffled_item_order, num_rows, start, stop, run.item_limit, run.sample_fraction, run.sample_seed,
+                    int(early_stopping.get("seed", 0)),
+                )
+                expected = len(order)
+                items: Iterator[Tuple[int, Dict[str, str]]] = reader.iter_indices(order)
+            else:
+                if early_stopping is not None:
+                    logger.warning("Run %s: dataset has no row index; early stopping scores items in file order", run_id)
+                expected = _expected_items(num_rows, start, stop, run.item_limit, run.sample_fraction)
+                items = iter_dataset_items(
+                    dataset.storage_path,
+                    reader=reader,
+                    offset=start,
+                    stop=stop,
+                    limit=run.item_limit,
+                    sample_fraction=run.sample_fraction,
+                    sample_seed=run.sample_seed,
+                )
+            # A run that already stopped early only scores metrics added since on its stored outputs
+            stopped_before = run.stopped_early
 
         metrics = json.loads(run.metrics_json)
-        provider = ModelProvider(
-            provider=run.model_provider,
-            model_name=run.model_name,
-            temperature=run.temperature,
-            top_p=run.top_p,
-            max_tokens=run.max_tokens,
+        # Applies to the generation and judge calls below, including those made via asyncio.to_thread
+        cache_enabled.set(run.use_cache)
+        if run.judge_provider or run.judge_model:
+            judge_override.set((run.judge_provider or JUDGE_PROVIDER, run.judge_model or JUDGE_MODEL))
+        # Shared across runs, so clients and local weights loaded by an earlier run are reused
+        provider = get_provider(run.model_provider, run.model_name, run.temperature, run.top_p, run.max_tokens)
+        model_label = f"{run.model_provider}:{run.model_name}"
+        generations = GenerationStore(
+            generation_config_hash(run.model_provider, run.model_name, run.temperature, run.top_p, run.max_tokens),
+            # Sampled outputs are meant to be independent draws, so only deterministic ones are reused;
+            # use_cache=false opts out of stored outputs just as it does of the generation cache
+            reuse=run.reuse_generations and run.use_cache and run.temperature == 0,
         )
+        pending_metrics = [m for m in json.loads(run.pending_metrics_json or "[]") if m in metrics]
 
-        metric_sums: Dict[str, float] = {name: 0.0 for name in metrics}
+        # Per-provider limits apply process-wide, to both the model under test and the judge
+        provider_limits = json.loads(run.provider_limits_json) if run.provider_limits_json else {}
+        for provider_name, values in provider_limits.items():
+            configure_provider_limits(provider_name, settings_from_dict(provider_name, values))
 
-        semaphore = asyncio.Semaphore(4)
+        progress = RunProgress(metrics, total=expected)
+        done, rescore, retry = await asyncio.to_thread(_load_completed_items, run_id, progress, pending_metrics)
+        stop_rule = EarlyStoppingRule.from_dict(early_stopping, metrics) if early_stopping is not None else None
+        stop_early = asyncio.Event()
+
+        def check_early_stopping() -> None:
+            if stop_rule is None or stop_early.is_set():
+                return
+            decided, details = stop_rule.evaluate(progress)
+            progress.early_stopping = {"stopped": decided or stopped_before, "metrics": details}
+            if decided or stopped_before:
+                if not stopped_before:
+                    logger.info("Run %s: stopping early after %d items", run_id, progress.completed)
+                stop_early.set()
+
+        check_early_stopping()
+        _live_progress[run_id] = progress
+        if done:
+            logger.info("Run %s: resuming with %d items already scored", run_id, len(done))
+        if retry:
+            logger.info("Run %s: generating %d items again whose generation failed", run_id, len(retry))
+        if rescore:
+            logger.info("Run %s: scoring %s on %d stored outputs", run_id, ", ".join(pending_metrics), len(rescore))
+        num_workers = max(1, run.concurrency)
+        # Cheap lexical metrics are collected across items and scored a chunk at a time
+        lexical_metrics = [m for m in metrics if m in BATCH_METRICS_REGISTRY]
+        lexical_batcher: MicroBatcher[Tuple[str, str, str], Dict[str, float]] = MicroBatcher(
+            lambda chunk: _score_lexical_chunk(lexical_metrics, chunk),
+            # No more items than there are workers can be waiting, so a full batch is never larger than that
+            max_batch_size=min(LEXICAL_BATCH_SIZE, num_workers),
+            max_in_flight=max(1, LEXICAL_METRIC_PROCESSES),
+        )
+        # Several judge metrics are scored together with one multi-rubric judge call per item
+        judge_metrics = [m for m in metrics if m in JUDGE_METRICS]
+        semantic_batcher: Optional[MicroBatcher[Tuple[int, str, str], float]] = None
+        if "semantic_similarity" in metrics:
+            # Reference embeddings are cached per dataset, so reruns only embed the predictions
+            embedding_cache = reference_cache(dataset.storage_path, num_rows)
+            semantic_batcher = MicroBatcher(
+                lambda chunk: _score_semantic_chunk(embedding_cache, chunk),
+                max_batch_size=min(EMBEDDING_BATCH_SIZE, num_workers),
+            )
+        cascade = MetricCascade.from_list(json.loads(run.cascade_json)) if run.cascade_json else None
+
+        async def score_output(
+            index: int,
+            input_text: str,
+            reference_text: str,
+            output_text: str,
+            names: List[str],
+            known: Optional[Dict[str, float]] = None,
+        ) -> Tuple[Dict[str, float], List[str], Dict[str, str]]:
+            # Returns the new scores, errors, and {metric: rule} for metrics a cascade rule decided instead
+            scores: Dict[str, float] = {}
+            errors: List[str] = []
+            derived: Dict[str, str] = {}
+            if any(m in lexical_metrics for m in names):
+                try:
+                    lexical = await lexical_batcher.submit((reference_text, output_text, input_text))
+                    scores.update({m: v for m, v in lexical.items() if m in names})
+                except Exception as e:
+                    # Lexical metrics without a score fall back to the per-item functions below
+                    logger.warning("Run %s item %s: batched lexical metrics failed: %r", run_id, index, e)
+            if semantic_batcher is not None and "semantic_similarity" in names:
+                try:
+                    scores["semantic_similarity"] = await semantic_batcher.submit((index, reference_text, output_text))
+                except Exception as e:
+                    # Scored on its own below, and recorded as an error if that fails too
+                    logger.warning("Run %s item %s: batched semantic similarity failed: %r", run_id, index, e)
+            if cascade is not None:
+                # Cheap metrics first, then the rules decide which judge metrics still need a call
+                if "data_validation" in names:
+                    structural = structural_data_validation(reference_text, output_text)
+                    if structural is not None:
+                        scores["data_validation"] = structural
+                decided = cascade.decide({**(known or {}), **scores}, [m for m in names if m not in scores])
+                for name, (value, rule) in decided.items():
+                    derived[name] = rule
+                    if value is not None:
+                        scores[name] = value
+                names = [m for m in names if m not in decided]
+            judged = [m for m in judge_metrics if m in names and m not in scores]
+            if len(judged) > 1:
+                try:
+                    with timed("metric", "judge_multi"):
+                        scores.update(await ajudge_multi(reference_text, output_text, input_text, judged))
+                except JudgeMultiError as e:
+                    # Only the fallbacks named here failed; the other rubrics keep their scores
+                    scores.update(e.scores)
+                    failed = e.errors
+                except Exception as e:
+                    # The judge call itself failed after the provider's retries; more calls would fail the same way
+                    failed = {m: e for m in judged}
+                else:
+                    failed = {}
+                for m, e in failed.items():
+                    logger.warning("Run %s item %s: metric %s failed: %r", run_id, index, m, e)
+                    errors.append(f"{m}: {e!r}")
+                names = [m for m in names if m not in failed]
+            for m in names:
+                fn = METRICS_REGISTRY.get(m)
+                if not fn or m in scores:
+                    continue
+                afn = ASYNC_METRICS_REGISTRY.get(m)
+                try:
+                    with timed("metric", m):
+                        if afn is not None:
+                            s = await afn(reference_text, output_text, input_text)
+                        else:
+                            s = await asyncio.to_thread(fn, reference_text, output_text, input_text)
+                except Exception as e:
+                    logger.warning("Run %s item %s: metric %s failed: %r", run_id, index, m, e)
+                    errors.append(f"{m}: {e!r}")
+                    continue
+                scores[m] = float(s)
+            return scores, errors, derived
 
         async def process_item(index: int, input_text: str, reference_text: str) -> None:
-            nonlocal metric_sums
-            async with semaphore:
-                output_text = await asyncio.to_thread(provider.generate, input_text)
-                scores: Dict[str, float] = {}
-                for m in metrics:
-                    fn = METRICS_REGISTRY.get(m)
-                    if not fn:
+            started = time.perf_counter()
+            telemetry.sample_queue_depth(thread_pool_queue_depth())
+            scores: Dict[str, float] = {}
+            errors: List[str] = []
+            output_text: Optional[str] = None
+            derived: Dict[str, str] = {}
+            try:
+                with timed("generation", model_label):
+                    output_text = await generations.get_or_generate(input_text, provider.agenerate)
+            except Exception as e:
+                logger.warning("Run %s item %s: generation failed: %r", run_id, index, e)
+                errors.append(f"generation: {e!r}")
+
+            if output_text is not None:
+                scores, metric_errors, derived = await score_output(index, input_text, reference_text, output_text, metrics)
+                errors.extend(metric_errors)
+
+            # Failed metrics are left out of the item's scores and of the aggregate, not recorded as 0.0
+            progress.record(scores, bool(errors), latency_s=time.perf_counter() - started, derived=derived)
+            check_early_stopping()
+            await writer.add(dict(
+                run_id=run_id,
+                item_index=index,
+                input_text=input_text,
+                reference_text=reference_text or None,
+                output_text=output_text,
+                scores_json=json.dumps(scores),
+                error_message="; ".join(errors) or None,
+                derived_json=json.dumps(derived) if derived else None,
+            ), scores, replace=index in retry)
+
+        async def rescore_item(stored: EvaluationItemResult) -> None:
+            # Metrics added after this item was scored; its stored output is reused, the model is not called
+            existing = json.loads(stored.scores_json or "{}")
+            existing_derived = json.loads(stored.derived_json or "{}")
+            needed = [m for m in pending_metrics if m not in existing and m not in existing_derived]
+            scores, errors, derived = await score_output(
+                stored.item_index, stored.input_text, stored.reference_text or "", stored.output_text or "", needed,
+                known=existing,
+            )
+            progress.add_scores(scores, new_error=bool(errors) and not stored.error_message, derived=derived)
+            error_message = "; ".join(filter(None, [stored.error_message, *errors])) or None
+            await writer.update(dict(
+                run_id=run_id,
+                item_index=stored.item_index,
+                scores_json=json.dumps({**existing, **scores}),
+                error_message=error_message,
+                derived_json=json.dumps({**existing_derived, **derived}) if existing_derived or derived else None,
+            ), scores)
+
+        # Bounded queue between the file reader and a fixed worker pool keeps memory flat for any dataset size
+        queue: asyncio.Queue = asyncio.Queue(maxsize=num_workers * 2)
+
+        async def produce() -> None:
+            if rescore:
+                stored_items = iter_item_results(run_id)
+                while True:
+                    with timed("dataset_load", "stored_results"):
+                        chunk = await asyncio.to_thread(_take, stored_items, LOAD_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    for stored in chunk:
+                        if stored.item_index in rescore:
+                            await queue.put((stored.item_index, None, stored))
+            while not stop_early.is_set():
+                with timed("dataset_load", "dataset"):
+                    chunk = await asyncio.to_thread(_take, items, LOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                for index, item in chunk:
+                    if stop_early.is_set():
+                        break
+                    if index in done:
                         continue
-                    try:
-                        s = await asyncio.to_thread(fn, reference_text, output_text, input_text)
-                    except Exception:
-                        s = 0.0
-                    scores[m] = float(s)
-                    metric_sums[m] += float(s)
-                with get_session() as s:
-                    s.add(EvaluationItemResult(
-                        run_id=run_id,
-                        item_index=index,
-                        input_text=input_text,
-                        reference_text=reference_text or None,
-                        output_text=output_text,
-                        scores_json=json.dumps(scores),
-                    ))
-                    s.commit()
-
-        tasks: List[asyncio.Task] = []
-        for idx, item in enumerate(items):
-            tasks.append(asyncio.create_task(process_item(idx, item.get("input", ""), item.get("reference", ""))))
-        await asyncio.gather(*tasks)
-
-        # Aggregate
-        total = max(len(items), 1)
-        aggregate = {name: metric_sums[name] / total for name in metrics}
-
-        with get_session() as session:
-            run = session.get(EvaluationRun, run_id)
+                    await queue.put((index, item, None))
+            for _ in range(num_workers):
+                await queue.put(None)
+
+        async def work() -> None:
+            while True:
+                entry = await queue.get()
+                if entry is None:
+                    return
+                idx, item, stored = entry
+                if stored is not None:
+                    await rescore_item(stored)
+                elif stop_early.is_set():
+                    # Queued before the rule was met; left unscored
+                    continue
+                else:
+                    await process_item(idx, item.get("input", ""), item.get("reference", ""))
+
+        # Rows are flushed in batches; leaving the block flushes the remainder on success or failure
+        def on_write(rows: int, seconds: float) -> None:
+            progress.record_write(rows, seconds)
+            observe("persistence", "results", seconds)
+
+        progress_task = asyncio.create_task(_persist_progress_periodically(run_id, progress, telemetry))
+        try:
+            async with ResultWriter(on_write=on_write) as writer:
+                async with asyncio.TaskGroup() as tg:
+                    tg.create_task(produce())
+                    for _ in range(num_workers):
+                        tg.create_task(work())
+        finally:
+            progress_task.cancel()
+        if reader is not None:
+            reader.close()
+
+        if generations.reused or generations.deduplicated:
+            logger.info(
+                "Run %s: %d outputs generated, %d reused from earlier runs, %d shared between identical inputs",
+                run_id, generations.generated, generations.reused, generations.deduplicated,
+            )
+
+        # Aggregate over the items each metric was actually scored on
+        aggregate = progress.means()
+
+        async with get_async_session() as session:
+            run = await session.get(EvaluationRun, run_id)
             assert run is not None
             run.status = "completed"
             run.updated_at = datetime.utcnow()
             run.aggregate_results_json = json.dumps(aggregate)
-            run.num_items = len(items)
+            run.pending_metrics_json = None
+            run.progress_json = json.dumps(progress.snapshot())
+            run.telemetry_json = json.dumps(telemetry.summary())
+            run.stopped_early = stop_early.is_set()
+            run.num_items = progress.completed
+            run.num_errors = progress.num_errors
             session.add(run)
-            session.commit()
+            await session.commit()
 
     except Exception as e:  # pragma: no cover
-        with get_session() as session:
-            run = session.get(EvaluationRun, run_id)
+        async with get_async_session() as session:
+            run = await session.get(EvaluationRun, run_id)
             if run is None:
                 return
             run.status = "failed"
+            # Worker failures arrive wrapped in the TaskGroup's ExceptionGroup
+            while isinstance(e, ExceptionGroup) and e.exceptions:
+                e = e.exceptions[0]
             run.error_message = str(e)
+            run.telemetry_json = json.dumps(telemetry.summary())
             run.updated_at = datetime.utcnow()
             session.add(run)
-            session.commit()
\ No newline at end of file
+            await session.commit()
\ No newline at end of file
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from sqlmodel import select
+
+from .batching import MicroBatcher
+from .database import get_session
+from .models import Generation
+from .persistence import insert_ignoring_duplicates
+
+logger = logging.getLogger(__name__)
+
+# Stored-generation lookups and inserts are grouped into one query per this many items
+GENERATION_STORE_BATCH_SIZE = int(os.getenv("GENERATION_STORE_BATCH_SIZE", "256"))
+
+
+def generation_config_hash(provider: str, model_name: str, temperature: float, top_p: float, max_tokens: int) -> str:
+    payload = json.dumps([provider, model_name, float(temperature), float(top_p), int(max_tokens)])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def input_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _lookup(config_hash: str, hashes: List[str]) -> List[Optional[str]]:
+    with get_session() as session:
+        rows = session.exec(
+            select(Generation.input_hash, Generation.output_text).where(
+                Generation.config_hash == config_hash, Generation.input_hash.in_(set(hashes))
+            )
+        ).all()
+    found = dict(rows)
+    return [found.get(h) for h in hashes]
+
+
+def _store(rows: List[Dict[str, Any]]) -> List[None]:
+    with get_session() as session:
+        session.execute(insert_ignoring_duplicates(session, Generation, ["config_hash", "input_hash"]), rows)
+        session.commit()
+    return [None] * len(rows)
+
+
+class GenerationStore:
+    """Generations for one model configuration, stored once and shared across runs.
+
+    With ``reuse`` set, an input generated by any earlier run with the same configuration is read back
+    instead of calling the model, identical inputs within a run share a single model call, and new
+    outputs are stored for later runs. Without ``reuse`` (sampled or opted-out runs) nothing is read or
+    written, since such rows could never be read back. Lookups and inserts are micro-batched.
+    """
+
+    def __init__(self, config_hash: str, reuse: bool = True, batch_size: int = GENERATION_STORE_BATCH_SIZE) -> None:
+        self.config_hash = config_hash
+        self.reuse = reuse
+        self.reused = 0
+        self.deduplicated = 0
+        self.generated = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._lookups: MicroBatcher[str, Optional[str]] = MicroBatcher(
+            lambda hashes: asyncio.to_thread(_lookup, config_hash, hashes), max_batch_size=batch_size
+        )
+        self._writes: MicroBatcher[Dict[str, Any], None] = MicroBatcher(
+            lambda rows: asyncio.to_thread(_store, rows), max_batch_size=batch_size
+        )
+
+    async def get_or_generate(self, input_text: str, generate: Callable[[str], Awaitable[str]]) -> str:
+        key = input_hash(input_text)
+        if not self.reuse:
+            self.generated += 1
+            return await generate(input_text)
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            # The same input is already being generated by another worker of this run
+            self.deduplicated += 1
+            return await asyncio.shield(pending)
+
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            try:
+                text = await self._lookups.submit(key)
+            except Exception as e:
+                logger.warning("Stored generation lookup failed, generating instead: %r", e)
+                text = None
+            if text is not None:
+                self.reused += 1
+            else:
+                text = await self._generate_and_store(key, input_text, generate)
+            future.set_result(text)
+            return text
+        except asyncio.CancelledError:
+            # Only happens when the whole run is cancelled, which takes the waiters down too
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Waiters re-raise it; retrieving it here keeps asyncio from logging it as unhandled
+            future.exception()
+            raise
+        finally:
+            # Later duplicates find the stored row; failed inputs are retried by the next occurrence
+            self._inflight.pop(key, None)
+
+    async def _generate_and_store(self, key: str, input_text: str, generate: Callable[[str], Awaitable[str]]) -> str:
+        text = await generate(input_text)
+        self.generated += 1
+        if text:
+            try:
+                await self._writes.submit(dict(config_hash=self.config_hash, input_hash=key, output_text=text))
+            except Exception as e:
+                logger.warning("Could not store generation: %r", e)
+        return text
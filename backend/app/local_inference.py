@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .batching import MicroBatcher
+
+HF_BATCH_SIZE = int(os.getenv("HF_BATCH_SIZE", "16"))
+HF_BATCH_WAIT_S = float(os.getenv("HF_BATCH_WAIT_S", "0.02"))
+HF_DEVICE = os.getenv("HF_DEVICE", "cpu")
+# Loaded weights are evicted least-recently-used first once either cap is exceeded (0 disables a cap)
+HF_MAX_LOADED_MODELS = int(os.getenv("HF_MAX_LOADED_MODELS", "2"))
+HF_MAX_MEMORY_MB = float(os.getenv("HF_MAX_MEMORY_MB", "0"))
+
+
+class LocalModel:
+    """Tokenizer and causal LM weights for one HuggingFace model, loaded once per process."""
+
+    def __init__(self, model_name: str, device: str = HF_DEVICE) -> None:
+        from transformers import AutoModelForCausalLM, AutoTokenizer  # type: ignore
+
+        self.model_name = model_name
+        self.device = device
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        # Decoder-only models must be left-padded so every row's continuation starts at the same position
+        tokenizer.padding_side = "left"
+        if tokenizer.pad_token is None:
+            tokenizer.pad_token = tokenizer.eos_token
+        self.tokenizer = tokenizer
+        self.model = AutoModelForCausalLM.from_pretrained(model_name).to(device)
+        self.model.eval()
+        # Neither the fast tokenizer nor generate() is safe to call concurrently on one instance
+        self.lock = threading.RLock()
+        self.memory_bytes = sum(t.numel() * t.element_size() for t in itertools.chain(self.model.parameters(), self.model.buffers()))
+        self.last_used = time.monotonic()
+
+    def token_length(self, prompt: str) -> int:
+        return len(self.tokenizer(prompt, add_special_tokens=False)["input_ids"])
+
+    def generate_padded(self, prompts: List[str], max_new_tokens: int, temperature: float, top_p: float) -> List[str]:
+        import torch  # type: ignore
+
+        encoded = self.tokenizer(prompts, return_tensors="pt", padding=True).to(self.device)
+        sampling: Dict[str, Any] = {"do_sample": temperature > 0}
+        if temperature > 0:
+            sampling.update(temperature=temperature, top_p=top_p)
+        with self.lock, torch.inference_mode():
+            output_ids = self.model.generate(
+                **encoded,
+                max_new_tokens=max_new_tokens,
+                pad_token_id=self.tokenizer.pad_token_id,
+                **sampling,
+            )
+        new_tokens = output_ids[:, encoded["input_ids"].shape[1] :]
+        completions = self.tokenizer.batch_decode(new_tokens, skip_special_tokens=True)
+        # Same shape as the text-generation pipeline's generated_text: the prompt followed by the completion
+        return [prompt + completion for prompt, completion in zip(prompts, completions)]
+
+
+_models: Dict[str, LocalModel] = {}
+_models_lock = threading.Lock()
+
+
+def get_local_model(model_name: str) -> LocalModel:
+    model = _models.get(model_name)
+    if model is None:
+        with _models_lock:
+            model = _models.get(model_name)
+            if model is None:
+                model = LocalModel(model_name)
+                _models[model_name] = model
+                _enforce_model_caps(keep=model_name)
+    model.last_used = time.monotonic()
+    return model
+
+
+def _enforce_model_caps(keep: str) -> None:
+    # Called with _models_lock held. Batches already running keep their own reference, so dropping a
+    # model from the registry only frees its memory once they finish.
+    max_bytes = HF_MAX_MEMORY_MB * 1024 * 1024
+    while len(_models) > 1:
+        over_count = HF_MAX_LOADED_MODELS > 0 and len(_models) > HF_MAX_LOADED_MODELS
+        over_memory = max_bytes > 0 and sum(m.memory_bytes for m in _models.values()) > max_bytes
+        if not (over_count or over_memory):
+            return
+        victim = min((m for name, m in _models.items() if name != keep), key=lambda m: m.last_used)
+        del _models[victim.model_name]
+
+
+def evict_idle_models(max_idle_s: float) -> List[str]:
+    """Drop models unused for ``max_idle_s`` seconds and return their names."""
+    cutoff = time.monotonic() - max_idle_s
+    with _models_lock:
+        idle = [name for name, m in _models.items() if m.last_used < cutoff]
+        for name in idle:
+            del _models[name]
+    return idle
+
+
+def loaded_models() -> Dict[str, int]:
+    return {name: m.memory_bytes for name, m in _models.items()}
+
+
+class LocalInferenceEngine:
+    """Batched generation for one (model, sampling settings) combination.
+
+    ``generate_batch`` sorts prompts by token length and generates in micro-batches of similar length
+    to keep padding low. ``agenerate`` lets concurrent callers share those batches: prompts arriving
+    within ``HF_BATCH_WAIT_S`` of each other (or while a batch is running) are generated together.
+    """
+
+    def __init__(self, model_name: str, temperature: float, top_p: float, max_tokens: int, batch_size: int = HF_BATCH_SIZE) -> None:
+        self.model_name = model_name
+        self.temperature = temperature
+        self.top_p = top_p
+        self.max_tokens = max_tokens
+        self.batch_size = max(1, batch_size)
+        self._batchers: Dict[int, MicroBatcher[str, str]] = {}
+
+    @property
+    def model(self) -> LocalModel:
+        return get_local_model(self.model_name)
+
+    def generate_batch(self, prompts: List[str]) -> List[str]:
+        if not prompts:
+            return []
+        model = self.model
+        outputs: List[Optional[str]] = [None] * len(prompts)
+        with model.lock:
+            order = sorted(range(len(prompts)), key=lambda i: model.token_length(prompts[i]))
+            for start in range(0, len(order), self.batch_size):
+                chunk = order[start : start + self.batch_size]
+                texts = model.generate_padded([prompts[i] for i in chunk], self.max_tokens, self.temperature, self.top_p)
+                for i, text in zip(chunk, texts):
+                    outputs[i] = text
+        return [text or "" for text in outputs]
+
+    async def agenerate(self, prompt: str) -> str:
+        # asyncio primitives belong to one loop, so each loop gets its own batcher
+        loop_id = id(asyncio.get_running_loop())
+        batcher = self._batchers.get(loop_id)
+        if batcher is None:
+            batcher = MicroBatcher(
+                lambda batch: asyncio.to_thread(self.generate_batch, batch),
+                max_batch_size=self.batch_size,
+                max_wait_s=HF_BATCH_WAIT_S,
+            )
+            self._batchers = {loop_id: batcher}
+        return await batcher.submit(prompt)
+
+
+_engines: Dict[Tuple[str, float, float, int], LocalInferenceEngine] = {}
+
+
+def get_engine(model_name: str, temperature: float, top_p: float, max_tokens: int) -> LocalInferenceEngine:
+    key = (model_name, float(temperature), float(top_p), int(max_tokens))
+    engine = _engines.get(key)
+    if engine is None:
+        with _models_lock:
+            engine = _engines.get(key)
+            if engine is None:
+                engine = LocalInferenceEngine(model_name, temperature, top_p, max_tokens)
+                _engines[key] = engine
+    return engine
@@ -1,32 +1,56 @@
 from __future__ import annotations
 
+import asyncio
+import csv
 import io
 import json
+import os
+import socket
+import tempfile
+import uuid
 from datetime import datetime
 from pathlib import Path
-from typing import List
+from typing import BinaryIO, Iterator, List, Literal, Optional, Set, Tuple
 
-from fastapi import BackgroundTasks, FastAPI, File, HTTPException, UploadFile
+from fastapi import BackgroundTasks, FastAPI, File, HTTPException, Query, UploadFile
+from starlette.background import BackgroundTask
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from sqlmodel import select
 
-from .database import get_session, init_db
-from .evaluation import run_evaluation_async
+from .analytics import backfill_scores, cached_compare_runs, compare_runs, score_summary, write_parquet
+from .cache import get_cache
+from .database import get_async_session, init_db
+from .datasets import DatasetIndexBuilder, DatasetValidationError, index_path_for, open_reader
+from .evaluation import get_live_progress, get_live_telemetry, is_run_active, live_run_progress
 from .metrics import available_metrics
+from .model_provider import registry_stats, start_provider_registry
+from .rate_limit import limiter_stats
 from .models import Dataset, EvaluationItemResult, EvaluationRun
+from .persistence import ItemResultFilter, afetch_item_results, iter_item_results
+from .telemetry import prometheus_text, thread_pool_queue_depth
+from .worker import claim_next_run, run_with_lease
 from .schemas import (
+    CacheStatsResponse,
     DatasetCreateResponse,
     DatasetInfo,
+    DatasetItem,
+    DatasetItemsPage,
     EvaluationCreateRequest,
+    EvaluationComparisonResponse,
     EvaluationCreateResponse,
     EvaluationItemScore,
+    EvaluationItemsPage,
+    EvaluationMetricsAddRequest,
     EvaluationResultsResponse,
     EvaluationStatusResponse,
+    EvaluationSummaryResponse,
 )
 
 app = FastAPI(title="LLM Checks - Evaluation Service")
 
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
 origins = [
     "http://localhost:3000",
     "http://localhost:5173",
@@ -42,11 +66,39 @@ app.add_middleware(
 )
 
 
+# "inline": runs execute as background tasks of this API process.
+# "queue": runs are only recorded as pending and picked up by `python -m app.worker` processes.
+EVALUATION_EXECUTOR = os.getenv("EVALUATION_EXECUTOR", "inline").lower()
+RESUME_RUNS_ON_STARTUP = os.getenv("RESUME_RUNS_ON_STARTUP", "true").lower() in {"1", "true", "yes"}
+# Inline runs are leased like worker runs, so several API processes never execute the same run
+API_WORKER_ID = f"api-{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+# Strong references to startup resume tasks so they are not garbage collected mid-run
+_resume_tasks: Set[asyncio.Task] = set()
+_eviction_task: Optional[asyncio.Task] = None
+
+
 @app.on_event("startup")
-def on_startup() -> None:
+async def on_startup() -> None:
     Path("data").mkdir(parents=True, exist_ok=True)
     Path("data/datasets").mkdir(parents=True, exist_ok=True)
     init_db()
+    global _eviction_task
+    # Providers listed in PROVIDER_WARMUP are ready before the first run is accepted or resumed
+    _eviction_task = await start_provider_registry()
+    if RESUME_RUNS_ON_STARTUP and EVALUATION_EXECUTOR == "inline":
+        # Pending runs and runs whose lease expired continue from their last persisted item; runs
+        # leased by another live process are left to it
+        while (run_id := await asyncio.to_thread(claim_next_run, API_WORKER_ID)) is not None:
+            task = asyncio.create_task(run_with_lease(run_id, API_WORKER_ID))
+            _resume_tasks.add(task)
+            task.add_done_callback(_resume_tasks.discard)
+
+
+async def _run_inline(run_id: int) -> None:
+    # Skipped when another process claimed the run first
+    if await asyncio.to_thread(claim_next_run, API_WORKER_ID, run_id) is not None:
+        await run_with_lease(run_id, API_WORKER_ID)
 
 
 @app.get("/health")
@@ -59,45 +111,117 @@ async def list_metrics() -> dict:
     return available_metrics()
 
 
+@app.get("/metrics/prometheus", response_class=PlainTextResponse)
+async def prometheus_metrics() -> PlainTextResponse:
+    """Process-wide telemetry for Prometheus; ``/metrics`` lists the evaluation metrics instead."""
+    runs = live_run_progress()
+    limiters = limiter_stats()
+    gauges = {
+        "llmchecks_thread_pool_queue_depth": (
+            "Work items waiting for a thread in the default executor", [({}, float(thread_pool_queue_depth() or 0))]
+        ),
+        "llmchecks_active_runs": ("Evaluations executing in this process", [({}, float(len(runs)))]),
+        "llmchecks_run_items_completed": (
+            "Items completed by each active run", [({"run_id": str(rid)}, float(p.completed)) for rid, p in runs.items()]
+        ),
+        "llmchecks_run_items_per_second": (
+            "Throughput of each active run", [({"run_id": str(rid)}, round(p.items_per_s(), 3)) for rid, p in runs.items()]
+        ),
+        "llmchecks_provider_in_flight": (
+            "Provider calls in flight", [({"provider": s["provider"]}, float(s["in_flight"])) for s in limiters]
+        ),
+        "llmchecks_provider_concurrency_limit": (
+            "Adaptive provider concurrency limit", [({"provider": s["provider"]}, float(s["limit"])) for s in limiters]
+        ),
+    }
+    return PlainTextResponse(prometheus_text(gauges), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/providers")
+async def provider_registry() -> dict:
+    return registry_stats()
+
+
+@app.get("/cache/stats", response_model=CacheStatsResponse)
+async def cache_stats():
+    cache = get_cache()
+    if cache is None:
+        return CacheStatsResponse(enabled=False)
+    return CacheStatsResponse(enabled=True, **cache.stats())
+
+
+def _write_and_index(f: BinaryIO, builder: DatasetIndexBuilder, chunk: bytes) -> None:
+    f.write(chunk)
+    builder.feed(chunk)
+
+
 @app.post("/datasets", response_model=DatasetCreateResponse)
 async def upload_dataset(file: UploadFile = File(...), name: str = "dataset"):
     filename = file.filename or "dataset.jsonl"
-    ext = Path(filename).suffix.lower()
-    if ext not in {".jsonl", ".json", ".csv"}:
-        raise HTTPException(status_code=400, detail="Unsupported file type. Use .jsonl or .csv")
-    storage_path = Path("data/datasets") / f"{int(datetime.utcnow().timestamp())}_{filename}"
-    content = await file.read()
-    with open(storage_path, "wb") as f:
-        f.write(content)
-
-    # Count items quickly
-    num_items = 0
-    if ext in {".jsonl", ".json"}:
-        for line in io.BytesIO(content).read().decode("utf-8").splitlines():
-            if line.strip():
-                num_items += 1
-    else:
-        num_items = max(0, io.BytesIO(content).read().decode("utf-8").count("\n") - 1)
+    try:
+        builder = DatasetIndexBuilder.for_filename(filename)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Random suffix keeps uploads with the same name in the same second from overwriting each other
+    storage_path = Path("data/datasets") / f"{int(datetime.utcnow().timestamp())}_{uuid.uuid4().hex[:8]}_{Path(filename).name}"
+    index_path = index_path_for(str(storage_path))
+
+    # Stream to disk while validating and indexing in the same pass; file I/O and parsing run off the event loop
+    try:
+        with open(storage_path, "wb") as f:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                await asyncio.to_thread(_write_and_index, f, builder, chunk)
+        await asyncio.to_thread(builder.finish)
+        await asyncio.to_thread(builder.write_index, index_path)
+    except DatasetValidationError as e:
+        storage_path.unlink(missing_ok=True)
+        Path(index_path).unlink(missing_ok=True)
+        raise HTTPException(status_code=400, detail=f"Invalid dataset: {e}")
 
-    with get_session() as session:
-        ds = Dataset(name=name, storage_path=str(storage_path), num_items=num_items)
+    async with get_async_session() as session:
+        ds = Dataset(name=name, storage_path=str(storage_path), index_path=index_path, num_items=builder.num_items)
         session.add(ds)
-        session.commit()
-        session.refresh(ds)
+        await session.commit()
+        await session.refresh(ds)
         return DatasetCreateResponse(dataset_id=ds.id, name=ds.name, num_items=ds.num_items)
 
 
 @app.get("/datasets", response_model=List[DatasetInfo])
 async def list_datasets():
-    with get_session() as session:
-        datasets = session.exec(select(Dataset)).all()
+    async with get_async_session() as session:
+        datasets = (await session.exec(select(Dataset))).all()
         return [DatasetInfo(id=d.id, name=d.name, description=d.description, num_items=d.num_items) for d in datasets]
 
 
+def _read_dataset_page(storage_path: str, index_path: Optional[str], offset: int, limit: int) -> Optional[Tuple[int, List[DatasetItem]]]:
+    reader = open_reader(storage_path, index_path)
+    if reader is None:
+        return None
+    try:
+        items = [DatasetItem(item_index=i, **item) for i, item in reader.iter_range(offset, offset + limit)]
+        return len(reader), items
+    finally:
+        reader.close()
+
+
+@app.get("/datasets/{dataset_id}/items", response_model=DatasetItemsPage)
+async def preview_dataset(dataset_id: int, offset: int = Query(0, ge=0), limit: int = Query(50, ge=1, le=1000)):
+    async with get_async_session() as session:
+        ds = await session.get(Dataset, dataset_id)
+        if not ds:
+            raise HTTPException(status_code=404, detail="Dataset not found")
+    # Seeks via the byte-offset index, so a page costs O(limit) regardless of where it starts
+    page = await asyncio.to_thread(_read_dataset_page, ds.storage_path, ds.index_path, offset, limit)
+    if page is None:
+        raise HTTPException(status_code=422, detail="Dataset file could not be indexed")
+    total, items = page
+    return DatasetItemsPage(dataset_id=dataset_id, offset=offset, limit=limit, total=total, items=items)
+
+
 @app.post("/evaluations", response_model=EvaluationCreateResponse)
 async def create_evaluation(req: EvaluationCreateRequest, background_tasks: BackgroundTasks):
     metrics_json = json.dumps(req.metrics)
-    with get_session() as session:
+    async with get_async_session() as session:
         run = EvaluationRun(
             name=req.name,
             dataset_id=req.dataset_id,
@@ -107,54 +231,324 @@ async def create_evaluation(req: EvaluationCreateRequest, background_tasks: Back
             top_p=req.top_p,
             max_tokens=req.max_tokens,
             metrics_json=metrics_json,
+            judge_provider=req.judge_provider,
+            judge_model=req.judge_model,
+            use_cache=req.use_cache,
+            reuse_generations=req.reuse_generations,
+            concurrency=req.concurrency,
+            provider_limits_json=json.dumps({k: v.model_dump(exclude_none=True) for k, v in req.provider_limits.items()}) if req.provider_limits else None,
+            item_offset=req.offset,
+            item_limit=req.limit,
+            sample_fraction=req.sample_fraction,
+            sample_seed=req.sample_seed,
+            shard_index=req.shard_index,
+            num_shards=req.num_shards,
+            cascade_json=json.dumps([rule.model_dump() for rule in req.cascade]) if req.cascade else None,
+            early_stopping_json=req.early_stopping.model_dump_json() if req.early_stopping else None,
             status="pending",
         )
         session.add(run)
-        session.commit()
-        session.refresh(run)
+        await session.commit()
+        await session.refresh(run)
 
-    background_tasks.add_task(run_evaluation_async, run.id)
+    if EVALUATION_EXECUTOR == "inline":
+        background_tasks.add_task(_run_inline, run.id)
     return EvaluationCreateResponse(run_id=run.id, status="pending")
 
 
-@app.get("/evaluations/{run_id}", response_model=EvaluationStatusResponse)
-async def get_evaluation_status(run_id: int):
-    with get_session() as session:
-        run = session.get(EvaluationRun, run_id)
+@app.post("/evaluations/{run_id}/resume", response_model=EvaluationCreateResponse)
+async def resume_evaluation(run_id: int, background_tasks: BackgroundTasks):
+    async with get_async_session() as session:
+        run = await session.get(EvaluationRun, run_id)
         if not run:
             raise HTTPException(status_code=404, detail="Run not found")
+        if run.status == "completed":
+            raise HTTPException(status_code=400, detail="Run already completed")
+        lease_live = run.lease_expires_at is not None and run.lease_expires_at > datetime.utcnow()
+        if is_run_active(run_id) or (run.status == "running" and lease_live):
+            raise HTTPException(status_code=409, detail="Run is already in progress")
+        run.status = "pending"
+        run.error_message = None
+        run.lease_expires_at = None
+        run.updated_at = datetime.utcnow()
+        session.add(run)
+        await session.commit()
+
+    if EVALUATION_EXECUTOR == "inline":
+        background_tasks.add_task(_run_inline, run_id)
+    return EvaluationCreateResponse(run_id=run_id, status="pending")
+
+
+@app.post("/evaluations/{run_id}/metrics", response_model=EvaluationCreateResponse)
+async def add_evaluation_metrics(run_id: int, req: EvaluationMetricsAddRequest, background_tasks: BackgroundTasks):
+    """Score additional metrics on the outputs a run already generated, without calling the model again."""
+    unknown = sorted(set(req.metrics) - set(available_metrics()))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown metrics: {', '.join(unknown)}")
+    async with get_async_session() as session:
+        run = await session.get(EvaluationRun, run_id)
+        if not run:
+            raise HTTPException(status_code=404, detail="Run not found")
+        lease_live = run.lease_expires_at is not None and run.lease_expires_at > datetime.utcnow()
+        if is_run_active(run_id) or run.status == "pending" or (run.status == "running" and lease_live):
+            raise HTTPException(status_code=409, detail="Run is in progress; add metrics once it has finished")
+        metrics = json.loads(run.metrics_json)
+        added = [m for m in dict.fromkeys(req.metrics) if m not in metrics]
+        if not added:
+            return EvaluationCreateResponse(run_id=run_id, status=run.status)
+        pending = json.loads(run.pending_metrics_json or "[]")
+        run.metrics_json = json.dumps(metrics + added)
+        run.pending_metrics_json = json.dumps(pending + [m for m in added if m not in pending])
+        run.status = "pending"
+        run.error_message = None
+        run.lease_expires_at = None
+        run.updated_at = datetime.utcnow()
+        session.add(run)
+        await session.commit()
+
+    if EVALUATION_EXECUTOR == "inline":
+        background_tasks.add_task(_run_inline, run_id)
+    return EvaluationCreateResponse(run_id=run_id, status="pending")
+
+
+# Declared before /evaluations/{run_id} so "compare" is not parsed as a run id
+@app.get("/evaluations/compare", response_model=EvaluationComparisonResponse)
+async def compare_evaluations(
+    base: int = Query(..., description="Baseline run id"),
+    candidate: int = Query(..., description="Run compared against the baseline"),
+    metrics: Optional[str] = Query(None, description="Comma-separated metrics; defaults to those both runs scored"),
+    n_boot: int = Query(1000, ge=100, le=20000, description="Bootstrap resamples"),
+    confidence: float = Query(0.95, gt=0.5, lt=1.0),
+    top_k: int = Query(10, ge=0, le=1000, description="Most regressed items returned per metric"),
+    seed: int = 0,
+):
+    async with get_async_session() as session:
+        base_run = await session.get(EvaluationRun, base)
+        candidate_run = await session.get(EvaluationRun, candidate)
+        if not base_run or not candidate_run:
+            raise HTTPException(status_code=404, detail="Run not found")
+        if base_run.dataset_id != candidate_run.dataset_id:
+            raise HTTPException(status_code=400, detail="Runs evaluated different datasets and cannot be paired")
+        base_metrics = json.loads(base_run.metrics_json)
+        shared = [m for m in base_metrics if m in set(json.loads(candidate_run.metrics_json))]
+        selected = [m.strip() for m in metrics.split(",") if m.strip()] if metrics else shared
+        unknown = [m for m in selected if m not in shared]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Metrics not scored by both runs: {', '.join(unknown)}")
+        finished = base_run.status == "completed" and candidate_run.status == "completed"
+        cache_key = (base, base_run.updated_at, candidate, candidate_run.updated_at, tuple(selected), n_boot, confidence, top_k, seed)
+        dataset_id = base_run.dataset_id
+
+    await asyncio.to_thread(backfill_scores, base)
+    await asyncio.to_thread(backfill_scores, candidate)
+    args = (base, candidate, selected, n_boot, confidence, top_k, seed)
+    if finished:
+        # Completed runs no longer change, so their comparison is computed once per process
+        result = await asyncio.to_thread(cached_compare_runs, cache_key, *args)
+    else:
+        result = await asyncio.to_thread(compare_runs, *args)
+    return EvaluationComparisonResponse(
+        base_run_id=base,
+        candidate_run_id=candidate,
+        dataset_id=dataset_id,
+        confidence=confidence,
+        n_boot=n_boot,
+        **result,
+    )
+
+
+async def _load_status(run_id: int) -> Optional[EvaluationStatusResponse]:
+    async with get_async_session() as session:
+        run = await session.get(EvaluationRun, run_id)
+        if not run:
+            return None
         metrics = json.loads(run.metrics_json)
         aggregate = json.loads(run.aggregate_results_json) if run.aggregate_results_json else None
+        # Runs executing in this process report live counters; others report the last persisted snapshot
+        progress = get_live_progress(run_id) if run.status == "running" else None
+        if progress is None and run.progress_json:
+            progress = json.loads(run.progress_json)
+        telemetry = get_live_telemetry(run_id) if run.status == "running" else None
+        if telemetry is None and run.telemetry_json:
+            telemetry = json.loads(run.telemetry_json)
         return EvaluationStatusResponse(
             run_id=run.id,
             status=run.status,
-            num_items=run.num_items,
+            num_items=progress["completed"] if progress else run.num_items,
+            num_errors=progress["num_errors"] if progress else run.num_errors,
             metrics=metrics,
             aggregate_results=aggregate,
             error_message=run.error_message,
+            progress=progress,
+            telemetry=telemetry,
+            stopped_early=run.stopped_early,
         )
 
 
+@app.get("/evaluations/{run_id}", response_model=EvaluationStatusResponse)
+async def get_evaluation_status(run_id: int):
+    status = await _load_status(run_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return status
+
+
+@app.get("/evaluations/{run_id}/events")
+async def stream_evaluation_events(run_id: int, interval: float = Query(1.0, ge=0.1, le=60.0)):
+    """Server-Sent Events: a ``progress`` event whenever the run's status or progress changes, then ``done``."""
+    if await _load_status(run_id) is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+
+    async def events():
+        last = None
+        while True:
+            status = await _load_status(run_id)
+            if status is None:
+                return
+            payload = status.model_dump_json()
+            finished = status.status in {"completed", "failed"}
+            if payload != last:
+                yield f"event: {'done' if finished else 'progress'}\ndata: {payload}\n\n"
+                last = payload
+            elif not finished:
+                # Comment line keeps proxies from closing an idle connection
+                yield ": keep-alive\n\n"
+            if finished:
+                return
+            await asyncio.sleep(interval)
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
+
+
+def _item_score(it: EvaluationItemResult) -> EvaluationItemScore:
+    return EvaluationItemScore(
+        item_index=it.item_index,
+        input_text=it.input_text,
+        reference_text=it.reference_text,
+        output_text=it.output_text,
+        scores=json.loads(it.scores_json or "{}"),
+        error_message=it.error_message,
+        derived=json.loads(it.derived_json or "{}"),
+    )
+
+
+async def _get_run_metrics(run_id: int) -> List[str]:
+    async with get_async_session() as session:
+        run = await session.get(EvaluationRun, run_id)
+        if not run:
+            raise HTTPException(status_code=404, detail="Run not found")
+        return json.loads(run.metrics_json)
+
+
+def _item_filter(metrics: List[str], metric: Optional[str], below: Optional[float], above: Optional[float], errors_only: bool) -> ItemResultFilter:
+    if (below is not None or above is not None) and not metric:
+        raise HTTPException(status_code=400, detail="`below`/`above` require `metric`")
+    if metric and metric not in metrics:
+        raise HTTPException(status_code=400, detail=f"Run did not score metric '{metric}'")
+    return ItemResultFilter(metric=metric, below=below, above=above, errors_only=errors_only)
+
+
 @app.get("/evaluations/{run_id}/results", response_model=EvaluationResultsResponse)
 async def get_evaluation_results(run_id: int):
-    with get_session() as session:
-        run = session.get(EvaluationRun, run_id)
+    async with get_async_session() as session:
+        run = await session.get(EvaluationRun, run_id)
         if not run:
             raise HTTPException(status_code=404, detail="Run not found")
         if run.status != "completed":
             raise HTTPException(status_code=400, detail=f"Run not completed. Current status: {run.status}")
         metrics = json.loads(run.metrics_json)
         aggregate = json.loads(run.aggregate_results_json) if run.aggregate_results_json else {}
-        items = session.exec(select(EvaluationItemResult).where(EvaluationItemResult.run_id == run_id)).all()
-        samples = []
-        for it in items[:100]:  # cap
-            samples.append(
-                EvaluationItemScore(
-                    item_index=it.item_index,
-                    input_text=it.input_text,
-                    reference_text=it.reference_text,
-                    output_text=it.output_text,
-                    scores=json.loads(it.scores_json or "{}"),
-                )
-            )
-        return EvaluationResultsResponse(run_id=run.id, metrics=metrics, aggregate_results=aggregate, samples=samples)
\ No newline at end of file
+    # First 100 items by index; page through the rest with /evaluations/{run_id}/items
+    items = await afetch_item_results(run_id, None, 100)
+    samples = [_item_score(it) for it in items]
+    return EvaluationResultsResponse(run_id=run_id, metrics=metrics, aggregate_results=aggregate, samples=samples)
+
+
+@app.get("/evaluations/{run_id}/summary", response_model=EvaluationSummaryResponse)
+async def get_evaluation_summary(run_id: int):
+    async with get_async_session() as session:
+        run = await session.get(EvaluationRun, run_id)
+        if not run:
+            raise HTTPException(status_code=404, detail="Run not found")
+        metrics = json.loads(run.metrics_json)
+        status = run.status
+    # Exact statistics over every stored score (the live progress stats are histogram estimates)
+    await asyncio.to_thread(backfill_scores, run_id)
+    summary = await asyncio.to_thread(score_summary, run_id, metrics)
+    return EvaluationSummaryResponse(run_id=run_id, status=status, metrics=summary)
+
+
+@app.get("/evaluations/{run_id}/items", response_model=EvaluationItemsPage)
+async def list_evaluation_items(
+    run_id: int,
+    cursor: Optional[int] = Query(None, description="item_index to continue after (next_cursor of the previous page)"),
+    limit: int = Query(100, ge=1, le=1000),
+    metric: Optional[str] = Query(None, description="Metric that `below`/`above` apply to"),
+    below: Optional[float] = Query(None, description="Only items whose `metric` score is below this"),
+    above: Optional[float] = Query(None, description="Only items whose `metric` score is above this"),
+    errors_only: bool = Query(False, description="Only items with a failed generation or metric"),
+):
+    filters = _item_filter(await _get_run_metrics(run_id), metric, below, above, errors_only)
+    if filters.metric:
+        await asyncio.to_thread(backfill_scores, run_id)
+    items = await afetch_item_results(run_id, cursor, limit, filters)
+    next_cursor = items[-1].item_index if len(items) == limit else None
+    return EvaluationItemsPage(run_id=run_id, limit=limit, items=[_item_score(it) for it in items], next_cursor=next_cursor)
+
+
+def _export_ndjson(run_id: int, filters: ItemResultFilter) -> Iterator[str]:
+    for it in iter_item_results(run_id, filters):
+        yield _item_score(it).model_dump_json() + "\n"
+
+
+def _export_csv(run_id: int, metrics: List[str], filters: ItemResultFilter) -> Iterator[str]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(["item_index", "input_text", "reference_text", "output_text", "error_message", *metrics])
+    for it in iter_item_results(run_id, filters):
+        scores = json.loads(it.scores_json or "{}")
+        writer.writerow([
+            it.item_index, it.input_text, it.reference_text or "", it.output_text or "", it.error_message or "",
+            *(scores.get(m, "") for m in metrics),
+        ])
+        if buf.tell() >= 64 * 1024:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+@app.get("/evaluations/{run_id}/export")
+async def export_evaluation_items(
+    run_id: int,
+    format: Literal["ndjson", "csv", "parquet"] = Query("ndjson"),
+    metric: Optional[str] = Query(None),
+    below: Optional[float] = Query(None),
+    above: Optional[float] = Query(None),
+    errors_only: bool = Query(False),
+):
+    metrics = await _get_run_metrics(run_id)
+    filters = _item_filter(metrics, metric, below, above, errors_only)
+    if filters.metric or format == "parquet":
+        await asyncio.to_thread(backfill_scores, run_id)
+    headers = {"Content-Disposition": f'attachment; filename="evaluation_{run_id}.{format}"'}
+    if format == "parquet":
+        # Parquet needs a seekable sink, so the file is built on disk first and removed once sent
+        fd, path = tempfile.mkstemp(suffix=".parquet")
+        os.close(fd)
+        try:
+            await asyncio.to_thread(write_parquet, run_id, metrics, path, filters)
+        except ImportError:
+            os.remove(path)
+            raise HTTPException(status_code=501, detail="Parquet export requires the optional pyarrow package")
+        except Exception:
+            os.remove(path)
+            raise
+        return FileResponse(path, media_type="application/vnd.apache.parquet", headers=headers, background=BackgroundTask(os.remove, path))
+    # Synchronous generators are iterated in a worker thread, one keyset page of rows at a time
+    if format == "csv":
+        body, media_type = _export_csv(run_id, metrics, filters), "text/csv"
+    else:
+        body, media_type = _export_ndjson(run_id, filters), "application/x-ndjson"
+    return StreamingResponse(body, media_type=media_type, headers=headers)
@@ -1,10 +1,13 @@
 from __future__ import annotations
 
-from typing import Callable, Dict
+import time
+from functools import partial
+from typing import Awaitable, Callable, Dict, List, Sequence, Tuple
 
-from .exact_match import exact_match
-from .bleu import bleu
-from .rouge import rougeL
+from .exact_match import exact_match, exact_match_batch
+from .bleu import bleu, bleu_batch
+from .rouge import rougeL, rougeL_batch
+from .semantic import EMBEDDING_BATCH_SIZE, reference_cache, semantic_similarity, semantic_similarity_cached
 from .llm_judge import (
     relevance,
     hallucination,
@@ -16,15 +19,27 @@ from .llm_judge import (
     correctness,
     confidence_score,
     data_validation,
+    structural_data_validation,
+    JUDGE_METRICS,
+    JudgeMultiError,
+    ajudge_metric,
+    ajudge_multi,
+    judge_multi,
+    judge_override,
 )
 
 # Metric function takes (reference, prediction, input_text)
 MetricFunction = Callable[[str, str, str], float]
+AsyncMetricFunction = Callable[[str, str, str], Awaitable[float]]
+# Batch metric function takes (references, predictions, inputs) and returns one score per item
+BatchMetricFunction = Callable[[Sequence[str], Sequence[str], Sequence[str]], List[float]]
 
 METRICS_REGISTRY: Dict[str, MetricFunction] = {
     "exact_match": exact_match,
     "bleu": bleu,
     "rougeL": rougeL,
+    # Local embedding model; runs batch these through semantic_similarity_cached instead
+    "semantic_similarity": semantic_similarity,
     # LLM-judge driven metrics
     "answer_relevancy": relevance,
     "hallucinations": hallucination,
@@ -38,12 +53,45 @@ METRICS_REGISTRY: Dict[str, MetricFunction] = {
     "data_validation": data_validation,
 }
 
+# Native async variants; metrics without one are run in a worker thread
+ASYNC_METRICS_REGISTRY: Dict[str, AsyncMetricFunction] = {
+    name: partial(ajudge_metric, name) for name in JUDGE_METRICS
+}
+
+# Cheap deterministic metrics scored a chunk of items at a time with cached scorers
+BATCH_METRICS_REGISTRY: Dict[str, BatchMetricFunction] = {
+    "exact_match": exact_match_batch,
+    "bleu": bleu_batch,
+    "rougeL": rougeL_batch,
+}
+
+
+def score_batch(
+    metric_names: Sequence[str], references: Sequence[str], predictions: Sequence[str], inputs: Sequence[str]
+) -> Dict[str, List[float]]:
+    # Module-level so it can be shipped to a process pool
+    return {name: BATCH_METRICS_REGISTRY[name](references, predictions, inputs) for name in metric_names}
+
+
+def score_batch_timed(
+    metric_names: Sequence[str], references: Sequence[str], predictions: Sequence[str], inputs: Sequence[str]
+) -> Tuple[Dict[str, List[float]], Dict[str, float]]:
+    """``score_batch`` plus the seconds spent on each metric, measured where the batch actually runs."""
+    scores: Dict[str, List[float]] = {}
+    seconds: Dict[str, float] = {}
+    for name in metric_names:
+        started = time.perf_counter()
+        scores[name] = BATCH_METRICS_REGISTRY[name](references, predictions, inputs)
+        seconds[name] = time.perf_counter() - started
+    return scores, seconds
+
 
 def available_metrics() -> Dict[str, str]:
     return {
         "exact_match": "Strict normalized string match",
         "bleu": "SacreBLEU score",
         "rougeL": "ROUGE-L F1 score",
+        "semantic_similarity": "Cosine similarity of local sentence embeddings (EMBEDDING_MODEL)",
         "answer_relevancy": "LLM judge: does the answer address the input?",
         "hallucinations": "LLM judge: presence of unsupported claims",
         "toxicity": "LLM judge (or detoxify if installed): offensive content",
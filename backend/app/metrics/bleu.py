@@ -1,13 +1,30 @@
 from __future__ import annotations
 
-try:
-    import sacrebleu  # type: ignore
-except Exception:  # pragma: no cover - optional dependency at runtime
-    sacrebleu = None
+from functools import lru_cache
+from typing import Any, List, Optional, Sequence
+
+
+@lru_cache(maxsize=1)
+def _scorer() -> Optional[Any]:
+    # Imported on first use (sacrebleu pulls in numpy and friends); same defaults as sacrebleu.corpus_bleu
+    try:
+        from sacrebleu.metrics import BLEU  # type: ignore
+    except Exception:  # pragma: no cover - optional dependency at runtime
+        return None
+    return BLEU()
 
 
 def bleu(reference: str, prediction: str, input_text: str) -> float:  # input_text unused
-    if sacrebleu is None:
+    scorer = _scorer()
+    if scorer is None:
         return 0.0
-    bleu_obj = sacrebleu.corpus_bleu([prediction], [[reference]])
-    return float(bleu_obj.score) / 100.0
\ No newline at end of file
+    bleu_obj = scorer.corpus_score([prediction], [[reference]])
+    return float(bleu_obj.score) / 100.0
+
+
+def bleu_batch(references: Sequence[str], predictions: Sequence[str], inputs: Sequence[str]) -> List[float]:
+    scorer = _scorer()
+    if scorer is None:
+        return [0.0] * len(predictions)
+    # Scored per item (as a one-sentence corpus) to keep parity with bleu()
+    return [float(scorer.corpus_score([p], [[r]]).score) / 100.0 for r, p in zip(references, predictions)]
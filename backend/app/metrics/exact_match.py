@@ -1,14 +1,22 @@
 from __future__ import annotations
 
 import re
+from typing import List, Sequence
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9\s]")
 
 
 def _normalize(text: str) -> str:
     text = text.lower()
-    text = re.sub(r"\s+", " ", text)
-    text = re.sub(r"[^a-z0-9\s]", "", text)
+    text = _WHITESPACE_RE.sub(" ", text)
+    text = _NON_ALNUM_RE.sub("", text)
     return text.strip()
 
 
 def exact_match(reference: str, prediction: str, input_text: str) -> float:  # input_text unused
-    return 1.0 if _normalize(reference) == _normalize(prediction) else 0.0
\ No newline at end of file
+    return 1.0 if _normalize(reference) == _normalize(prediction) else 0.0
+
+
+def exact_match_batch(references: Sequence[str], predictions: Sequence[str], inputs: Sequence[str]) -> List[float]:
+    return [1.0 if _normalize(r) == _normalize(p) else 0.0 for r, p in zip(references, predictions)]
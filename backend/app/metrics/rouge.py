@@ -1,14 +1,29 @@
 from __future__ import annotations
 
-try:
-    from rouge_score import rouge_scorer  # type: ignore
-except Exception:  # pragma: no cover - optional dependency at runtime
-    rouge_scorer = None
+from functools import lru_cache
+from typing import Any, List, Optional, Sequence
+
+
+@lru_cache(maxsize=1)
+def _scorer() -> Optional[Any]:
+    # Imported on first use: rouge_score loads nltk, which dominates app startup otherwise
+    try:
+        from rouge_score import rouge_scorer  # type: ignore
+    except Exception:  # pragma: no cover - optional dependency at runtime
+        return None
+    return rouge_scorer.RougeScorer(["rougeL"], use_stemmer=True)
 
 
 def rougeL(reference: str, prediction: str, input_text: str) -> float:  # input_text unused
-    if rouge_scorer is None:
+    scorer = _scorer()
+    if scorer is None:
         return 0.0
-    scorer = rouge_scorer.RougeScorer(["rougeL"], use_stemmer=True)
     scores = scorer.score(reference, prediction)
-    return float(scores["rougeL"].fmeasure)
\ No newline at end of file
+    return float(scores["rougeL"].fmeasure)
+
+
+def rougeL_batch(references: Sequence[str], predictions: Sequence[str], inputs: Sequence[str]) -> List[float]:
+    scorer = _scorer()
+    if scorer is None:
+        return [0.0] * len(predictions)
+    return [float(scorer.score(r, p)["rougeL"].fmeasure) for r, p in zip(references, predictions)]
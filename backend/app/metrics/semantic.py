@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+EMBEDDING_MAX_TOKENS = int(os.getenv("EMBEDDING_MAX_TOKENS", "256"))
+EMBEDDING_DEVICE = os.getenv("EMBEDDING_DEVICE", os.getenv("HF_DEVICE", "cpu"))
+
+
+class Encoder:
+    """Sentence encoder: a HuggingFace encoder model with mean pooling, returning unit-length float32 rows."""
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL, device: str = EMBEDDING_DEVICE) -> None:
+        from transformers import AutoModel, AutoTokenizer  # type: ignore
+
+        self.model_name = model_name
+        self.device = device
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModel.from_pretrained(model_name).to(device)
+        self.model.eval()
+        # The fast tokenizer is not safe to call concurrently on one instance
+        self.lock = threading.Lock()
+
+    def encode(self, texts: Sequence[str]) -> Any:
+        import numpy as np
+        import torch  # type: ignore
+
+        # Similar lengths share a batch, so little compute goes to padding
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors: Optional[Any] = None
+        for start in range(0, len(order), EMBEDDING_BATCH_SIZE):
+            chunk = order[start : start + EMBEDDING_BATCH_SIZE]
+            with self.lock, torch.inference_mode():
+                encoded = self.tokenizer(
+                    [texts[i] for i in chunk], padding=True, truncation=True, max_length=EMBEDDING_MAX_TOKENS, return_tensors="pt"
+                ).to(self.device)
+                hidden = self.model(**encoded).last_hidden_state
+                mask = encoded["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+                pooled = ((hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)).float().cpu().numpy()
+            if vectors is None:
+                vectors = np.empty((len(texts), pooled.shape[1]), dtype=np.float32)
+            vectors[chunk] = pooled
+        if vectors is None:
+            return np.empty((0, 0), dtype=np.float32)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return vectors
+
+
+_encoder: Optional[Encoder] = None
+_encoder_lock = threading.Lock()
+
+
+def get_encoder() -> Encoder:
+    # Loaded on first use and shared by every run in the process
+    global _encoder
+    if _encoder is None:
+        with _encoder_lock:
+            if _encoder is None:
+                _encoder = Encoder()
+    return _encoder
+
+
+def cosine_scores(references: Any, predictions: Any) -> List[float]:
+    """Row-wise cosine similarity of unit vectors, clipped to [0, 1] like the other metrics."""
+    import numpy as np
+
+    return np.clip(np.einsum("ij,ij->i", references, predictions), 0.0, 1.0).tolist()
+
+
+def semantic_similarity(reference: str, prediction: str, input_text: str) -> float:  # input_text unused
+    return semantic_similarity_batch([reference], [prediction], [input_text])[0]
+
+
+def semantic_similarity_batch(references: Sequence[str], predictions: Sequence[str], inputs: Sequence[str]) -> List[float]:
+    vectors = get_encoder().encode([*references, *predictions])
+    return cosine_scores(vectors[: len(references)], vectors[len(references) :])
+
+
+class ReferenceEmbeddingCache:
+    """Reference embeddings of one dataset in memory-mapped ``.npy`` sidecars next to the dataset file.
+
+    Row ``i`` holds the embedding of dataset row ``i``, and a parallel flag array marks the rows that
+    have been embedded, so later runs on the dataset only embed their predictions.
+    """
+
+    def __init__(self, storage_path: str, num_rows: int, model_name: str = EMBEDDING_MODEL) -> None:
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+        self.path = f"{storage_path}.emb-{slug}.npy"
+        self.filled_path = f"{storage_path}.emb-{slug}.filled.npy"
+        self.num_rows = num_rows
+        self.hits = 0
+        self.misses = 0
+        self._vectors: Optional[Any] = None
+        self._filled: Optional[Any] = None
+        self._lock = threading.Lock()
+
+    def _open(self, dim: Optional[int]) -> None:
+        # Called with the lock held; ``dim`` is only known once something has been embedded
+        import numpy as np
+
+        if self._vectors is not None:
+            return
+        if os.path.exists(self.path) and os.path.exists(self.filled_path):
+            vectors = np.load(self.path, mmap_mode="r+")
+            filled = np.load(self.filled_path, mmap_mode="r+")
+            if vectors.shape[0] == self.num_rows and filled.shape == (self.num_rows,) and dim in (None, vectors.shape[1]):
+                self._vectors, self._filled = vectors, filled
+                return
+        if dim is None:
+            return
+        # Sparse files on most filesystems, so unembedded rows take no disk space
+        self._filled = np.lib.format.open_memmap(self.filled_path, mode="w+", dtype=np.bool_, shape=(self.num_rows,))
+        self._vectors = np.lib.format.open_memmap(self.path, mode="w+", dtype=np.float32, shape=(self.num_rows, dim))
+
+    def embeddings(self, indices: Sequence[int], references: Sequence[str]) -> Any:
+        """Embeddings of ``references`` (dataset rows ``indices``), embedding and storing only the missing rows."""
+        import numpy as np
+
+        rows = np.asarray(indices, dtype=np.int64)
+        cacheable = (rows >= 0) & (rows < self.num_rows)
+        with self._lock:
+            self._open(None)
+            cached = np.zeros(len(rows), dtype=bool)
+            if self._filled is not None:
+                cached[cacheable] = self._filled[rows[cacheable]]
+            result = np.array(self._vectors[rows[cached]]) if cached.any() else None
+        missing = np.flatnonzero(~cached)
+        self.hits += int(cached.sum())
+        self.misses += len(missing)
+        if not len(missing):
+            return result
+        new = get_encoder().encode([references[i] for i in missing])
+        out = np.empty((len(rows), new.shape[1]), dtype=np.float32)
+        out[missing] = new
+        if result is not None:
+            out[cached] = result
+        store = missing[cacheable[missing]]
+        if len(store):
+            with self._lock:
+                self._open(new.shape[1])
+                assert self._vectors is not None and self._filled is not None
+                # Vectors land before their flags, so an interrupted write is re-embedded rather than read
+                self._vectors[rows[store]] = out[store]
+                self._vectors.flush()
+                self._filled[rows[store]] = True
+                self._filled.flush()
+        return out
+
+
+_reference_caches: Dict[Tuple[str, str], ReferenceEmbeddingCache] = {}
+_reference_caches_lock = threading.Lock()
+
+
+def reference_cache(storage_path: str, num_rows: int) -> ReferenceEmbeddingCache:
+    # One instance per dataset file and model, shared by concurrent runs on the same dataset
+    key = (storage_path, EMBEDDING_MODEL)
+    with _reference_caches_lock:
+        cache = _reference_caches.get(key)
+        if cache is None or cache.num_rows != num_rows:
+            cache = _reference_caches[key] = ReferenceEmbeddingCache(storage_path, num_rows)
+        return cache
+
+
+def semantic_similarity_cached(
+    cache: ReferenceEmbeddingCache, indices: Sequence[int], references: Sequence[str], predictions: Sequence[str]
+) -> List[float]:
+    """``semantic_similarity_batch`` with the reference embeddings looked up in ``cache`` by dataset row."""
+    reference_vectors = cache.embeddings(indices, references)
+    return cosine_scores(reference_vectors, get_encoder().encode(predictions))
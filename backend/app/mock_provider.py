@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict
+
+# Offline provider used for development and benchmarks. Model "echo" (or any other name) returns the
+# prompt; model "judge" answers judge prompts with deterministic scores derived from the prompt text.
+MOCK_LATENCY_MS = float(os.getenv("MOCK_LATENCY_MS", "0"))
+MOCK_LATENCY_JITTER_MS = float(os.getenv("MOCK_LATENCY_JITTER_MS", "0"))
+# fixed | uniform | exponential | lognormal
+MOCK_LATENCY_DISTRIBUTION = os.getenv("MOCK_LATENCY_DISTRIBUTION", "fixed")
+MOCK_ERROR_RATE = float(os.getenv("MOCK_ERROR_RATE", "0"))
+MOCK_SEED = os.getenv("MOCK_SEED")
+
+JUDGE_STUB_MODEL = "judge"
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+
+
+class MockProviderError(Exception):
+    """Injected failure. ``status_code`` 503 is retried like a real outage, 400 is not."""
+
+    def __init__(self, status_code: int) -> None:
+        super().__init__(f"mock provider injected error (status {status_code})")
+        self.status_code = status_code
+
+
+@dataclass
+class MockSettings:
+    latency_ms: float = MOCK_LATENCY_MS
+    jitter_ms: float = MOCK_LATENCY_JITTER_MS
+    distribution: str = MOCK_LATENCY_DISTRIBUTION
+    error_rate: float = MOCK_ERROR_RATE
+    retryable_errors: bool = True
+
+    def __post_init__(self) -> None:
+        if self.distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution {self.distribution!r}; expected one of {LATENCY_DISTRIBUTIONS}")
+
+
+_settings: Dict[str, MockSettings] = {}
+_rng = random.Random(int(MOCK_SEED) if MOCK_SEED else None)
+_rng_lock = threading.Lock()
+
+
+def configure_mock(model_name: str, settings: MockSettings) -> None:
+    _settings[model_name] = settings
+
+
+def mock_settings(model_name: str) -> MockSettings:
+    return _settings.get(model_name) or MockSettings()
+
+
+def sample_latency_s(settings: MockSettings) -> float:
+    mean = settings.latency_ms
+    if mean <= 0:
+        return 0.0
+    with _rng_lock:
+        if settings.distribution == "uniform":
+            value = _rng.uniform(mean - settings.jitter_ms, mean + settings.jitter_ms)
+        elif settings.distribution == "exponential":
+            value = _rng.expovariate(1.0 / mean)
+        elif settings.distribution == "lognormal":
+            # Parameterised so the median is latency_ms; jitter_ms sets the spread (sigma = jitter / mean)
+            value = _rng.lognormvariate(0.0, settings.jitter_ms / mean) * mean
+        else:
+            value = mean
+    return max(value, 0.0) / 1000.0
+
+
+def _maybe_fail(settings: MockSettings) -> None:
+    if settings.error_rate <= 0:
+        return
+    with _rng_lock:
+        failed = _rng.random() < settings.error_rate
+    if failed:
+        raise MockProviderError(503 if settings.retryable_errors else 400)
+
+
+_RUBRICS_HEADER = "Rubrics (score each independently):\n"
+_RUBRIC_LINE = re.compile(r"^- (\w+): ", re.MULTILINE)
+
+
+def _stub_score(prompt: str, name: str) -> float:
+    digest = hashlib.blake2b(f"{name}\0{prompt}".encode("utf-8"), digest_size=8).digest()
+    return round(int.from_bytes(digest, "big") / 2**64, 4)
+
+
+def judge_stub_response(prompt: str) -> str:
+    """Well-formed judge output with a pseudo-random but reproducible score per rubric."""
+    start = prompt.find(_RUBRICS_HEADER)
+    if start == -1:
+        return json.dumps({"score": _stub_score(prompt, "score"), "rationale": "stub"})
+    # Multi-rubric prompts list one "- metric: Title. Rubric" line per metric before the input
+    block = prompt[start + len(_RUBRICS_HEADER) :].split("\n\n", 1)[0]
+    return json.dumps({"scores": {name: _stub_score(prompt, name) for name in _RUBRIC_LINE.findall(block)}})
+
+
+def _response(model_name: str, prompt: str) -> str:
+    if model_name == JUDGE_STUB_MODEL:
+        return judge_stub_response(prompt)
+    return prompt
+
+
+def mock_generate(model_name: str, prompt: str) -> str:
+    settings = mock_settings(model_name)
+    delay = sample_latency_s(settings)
+    if delay:
+        time.sleep(delay)
+    _maybe_fail(settings)
+    return _response(model_name, prompt)
+
+
+async def amock_generate(model_name: str, prompt: str) -> str:
+    settings = mock_settings(model_name)
+    delay = sample_latency_s(settings)
+    # Always yields, so even zero-latency calls interleave like real I/O
+    await asyncio.sleep(delay)
+    _maybe_fail(settings)
+    return _response(model_name, prompt)
+
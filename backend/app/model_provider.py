@@ -1,7 +1,86 @@
 from __future__ import annotations
 
+import asyncio
+import logging
 import os
-from typing import Optional
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from .cache import cache_enabled, get_cache, make_cache_key
+from .local_inference import evict_idle_models, get_engine, get_local_model, loaded_models
+from .mock_provider import amock_generate, mock_generate
+from .rate_limit import call_with_retries, get_provider_limiter, provider_settings
+from .telemetry import record_tokens
+
+logger = logging.getLogger(__name__)
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("PROVIDER_HTTP_MAX_CONNECTIONS", "512"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("PROVIDER_HTTP_MAX_KEEPALIVE", "128"))
+HTTP_TIMEOUT_S = float(os.getenv("PROVIDER_HTTP_TIMEOUT_S", "120"))
+# Shared ModelProvider instances: at most this many are kept, and ones unused for the idle TTL are dropped
+PROVIDER_REGISTRY_MAX_ENTRIES = int(os.getenv("PROVIDER_REGISTRY_MAX_ENTRIES", "64"))
+PROVIDER_IDLE_TTL_S = float(os.getenv("PROVIDER_IDLE_TTL_S", "1800"))
+PROVIDER_EVICTION_INTERVAL_S = float(os.getenv("PROVIDER_EVICTION_INTERVAL_S", "60"))
+# Comma-separated provider:model pairs initialised at startup, e.g. "gemini:gemini-1.5-flash,huggingface:gpt2"
+PROVIDER_WARMUP = os.getenv("PROVIDER_WARMUP", "")
+
+# Process-wide pooled async HTTP clients, one per provider, shared by every ModelProvider instance
+_async_http_clients: Dict[str, Any] = {}
+_gemini_configured = False
+_client_lock = threading.Lock()
+
+
+def _shared_async_http_client(provider: str) -> Any:
+    client = _async_http_clients.get(provider)
+    if client is None:
+        import httpx
+
+        with _client_lock:
+            client = _async_http_clients.get(provider)
+            if client is None:
+                client = httpx.AsyncClient(
+                    limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_KEEPALIVE),
+                    timeout=HTTP_TIMEOUT_S,
+                )
+                _async_http_clients[provider] = client
+    return client
+
+
+def _configure_gemini() -> Any:
+    global _gemini_configured
+    try:
+        import google.generativeai as genai  # type: ignore
+    except Exception as e:
+        raise RuntimeError("google-generativeai is not installed. Please install to use Gemini.") from e
+    if not _gemini_configured:
+        api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY") or os.getenv("GOOGLE_GENAI_API_KEY")
+        if not api_key:
+            raise RuntimeError("GEMINI_API_KEY (or GOOGLE_API_KEY) is required for Gemini provider.")
+        genai.configure(api_key=api_key)
+        _gemini_configured = True
+    return genai
+
+
+def _litellm_text(response: Any, model: str) -> str:
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        record_tokens(model, getattr(usage, "prompt_tokens", 0), getattr(usage, "completion_tokens", 0))
+    content = response.choices[0].message["content"]  # type: ignore
+    return content or ""
+
+
+def _gemini_text(resp: Any, model: str) -> str:
+    usage = getattr(resp, "usage_metadata", None)
+    if usage is not None:
+        record_tokens(model, getattr(usage, "prompt_token_count", 0), getattr(usage, "candidates_token_count", 0))
+    try:
+        text = resp.text
+    except ValueError:
+        # Blocked or empty candidates: there is no text to score
+        return ""
+    return str(text) if text is not None else str(resp)
 
 
 class ModelProvider:
@@ -12,80 +91,230 @@ class ModelProvider:
         self.top_p = top_p
         self.max_tokens = max_tokens
 
-        self._pipeline = None
-        self._litellm = None
+        # SDKs are imported and configured on first use: litellm alone takes seconds to import
+        self._litellm: Any = None
         self._gemini_model = None
 
-        if provider in {"litellm", "openai"}:
+    def warm_up(self) -> None:
+        """Pay one-off initialisation (imports, client configuration, model weights) ahead of the first call."""
+        if self.provider in {"litellm", "openai"}:
+            self._get_litellm()
+        elif self.provider == "huggingface":
+            get_local_model(self.model_name)
+        elif self.provider == "gemini":
+            self._get_gemini_model()
+
+    def _cache_key(self, prompt: str) -> Optional[str]:
+        # Only deterministic (temperature=0) generations are reused; sampled outputs must stay fresh
+        if self.temperature != 0 or not cache_enabled.get():
+            return None
+        return make_cache_key(self.provider, self.model_name, self.temperature, self.top_p, self.max_tokens, prompt)
+
+    def generate(self, prompt: str) -> str:
+        key = self._cache_key(prompt)
+        cache = get_cache() if key else None
+        if cache is not None:
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+        text = call_with_retries(lambda: self._generate(prompt), provider_settings(self.provider), self.provider)
+        if cache is not None and text:
+            cache.set(key, text)
+        return text
+
+    async def agenerate(self, prompt: str) -> str:
+        key = self._cache_key(prompt)
+        # The cache is blocking SQLite behind a lock shared with worker threads, so it stays off the loop
+        cache = await asyncio.to_thread(get_cache) if key else None
+        if cache is not None:
+            cached = await asyncio.to_thread(cache.get, key)
+            if cached is not None:
+                return cached
+        if self.provider == "huggingface":
+            # Local inference has no remote quota; the engine's micro-batching governs throughput
+            text = await self._agenerate(prompt)
+        else:
+            limiter = get_provider_limiter(self.provider)
+            text = await limiter.call(lambda: self._agenerate(prompt), estimated_tokens=self.estimate_tokens(prompt))
+        if cache is not None and text:
+            await asyncio.to_thread(cache.set, key, text)
+        return text
+
+    def generate_batch(self, prompts: List[str]) -> List[str]:
+        keys = [self._cache_key(p) for p in prompts]
+        cache = get_cache() if any(keys) else None
+        outputs: List[Optional[str]] = [None] * len(prompts)
+        if cache is not None:
+            for i, key in enumerate(keys):
+                if key:
+                    outputs[i] = cache.get(key)
+        missing = [i for i, out in enumerate(outputs) if out is None]
+        if self.provider == "huggingface":
+            generated = get_engine(self.model_name, self.temperature, self.top_p, self.max_tokens).generate_batch(
+                [prompts[i] for i in missing]
+            )
+        else:
+            generated = [
+                call_with_retries(lambda p=prompts[i]: self._generate(p), provider_settings(self.provider), self.provider)
+                for i in missing
+            ]
+        for i, text in zip(missing, generated):
+            outputs[i] = text
+            if cache is not None and keys[i] and text:
+                cache.set(keys[i], text)
+        return [out or "" for out in outputs]
+
+    def estimate_tokens(self, prompt: str) -> int:
+        # Rough budget for tokens-per-minute limits: ~4 characters per prompt token plus the completion cap
+        return len(prompt) // 4 + self.max_tokens
+
+    def _get_litellm(self) -> Any:
+        if self._litellm is None:
             try:
                 import litellm  # type: ignore
+            except Exception as e:
+                raise RuntimeError("litellm is not installed. Please install to use hosted providers.") from e
+            self._litellm = litellm
+        return self._litellm
 
-                self._litellm = litellm
-            except Exception:
-                self._litellm = None
-        elif provider == "huggingface":
-            # Lazy import; heavy deps may not be available. Only instantiate on first call.
-            pass
-        elif provider == "gemini":
-            # Configure on first use
-            pass
+    def _get_gemini_model(self) -> Any:
+        if self._gemini_model is None:
+            genai = _configure_gemini()
+            self._gemini_model = genai.GenerativeModel(
+                model_name=self.model_name,
+                generation_config={
+                    "temperature": self.temperature,
+                    "top_p": self.top_p,
+                    "max_output_tokens": self.max_tokens,
+                },
+            )
+        return self._gemini_model
 
-    def generate(self, prompt: str) -> str:
+    def _generate(self, prompt: str) -> str:
         if self.provider in {"litellm", "openai"}:
-            if self._litellm is None:
-                raise RuntimeError("litellm is not installed. Please install to use hosted providers.")
-            response = self._litellm.completion(
+            response = self._get_litellm().completion(
                 model=self.model_name,
                 messages=[{"role": "user", "content": prompt}],
                 temperature=self.temperature,
                 top_p=self.top_p,
                 max_tokens=self.max_tokens,
             )
-            content = response.choices[0].message["content"]  # type: ignore
-            return content or ""
+            return _litellm_text(response, f"{self.provider}:{self.model_name}")
 
         if self.provider == "huggingface":
-            if self._pipeline is None:
-                from transformers import pipeline  # type: ignore
-
-                self._pipeline = pipeline(
-                    "text-generation",
-                    model=self.model_name,
-                    max_new_tokens=self.max_tokens,
-                    do_sample=self.temperature > 0,
-                    top_p=self.top_p,
-                    temperature=max(self.temperature, 1e-5),
-                )
-            outputs = self._pipeline(prompt)
-            if isinstance(outputs, list) and outputs and "generated_text" in outputs[0]:
-                return str(outputs[0]["generated_text"])  # type: ignore
-            return str(outputs)
+            return get_engine(self.model_name, self.temperature, self.top_p, self.max_tokens).generate_batch([prompt])[0]
 
         if self.provider == "gemini":
-            if self._gemini_model is None:
-                try:
-                    import google.generativeai as genai  # type: ignore
-                except Exception as e:
-                    raise RuntimeError("google-generativeai is not installed. Please install to use Gemini.") from e
-                api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY") or os.getenv("GOOGLE_GENAI_API_KEY")
-                if not api_key:
-                    raise RuntimeError("GEMINI_API_KEY (or GOOGLE_API_KEY) is required for Gemini provider.")
-                genai.configure(api_key=api_key)
-                self._gemini_model = genai.GenerativeModel(
-                    model_name=self.model_name,
-                    generation_config={
-                        "temperature": self.temperature,
-                        "top_p": self.top_p,
-                        "max_output_tokens": self.max_tokens,
-                    },
-                )
-            try:
-                resp = self._gemini_model.generate_content(prompt)
-                # For safety, handle both .text and candidates
-                if hasattr(resp, "text") and resp.text is not None:
-                    return str(resp.text)
-                return str(resp)
-            except Exception:
-                return ""
-
-        raise ValueError(f"Unknown provider: {self.provider}")
\ No newline at end of file
+            model = self._get_gemini_model()
+            # API errors propagate so rate limits and outages are retried and reported, not scored as ""
+            return _gemini_text(model.generate_content(prompt), f"gemini:{self.model_name}")
+
+        if self.provider == "mock":
+            # Offline stub with configurable latency and injected errors (see mock_provider)
+            return mock_generate(self.model_name, prompt)
+
+        raise ValueError(f"Unknown provider: {self.provider}")
+
+    async def _agenerate(self, prompt: str) -> str:
+        if self.provider in {"litellm", "openai"}:
+            # The first import happens off the event loop so it does not stall other runs
+            litellm = self._litellm or await asyncio.to_thread(self._get_litellm)
+            if getattr(litellm, "aclient_session", None) is None:
+                litellm.aclient_session = _shared_async_http_client("litellm")
+            response = await litellm.acompletion(
+                model=self.model_name,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=self.temperature,
+                top_p=self.top_p,
+                max_tokens=self.max_tokens,
+            )
+            return _litellm_text(response, f"{self.provider}:{self.model_name}")
+
+        if self.provider == "huggingface":
+            # Concurrent prompts are coalesced into padded, length-sorted batches off the event loop
+            return await get_engine(self.model_name, self.temperature, self.top_p, self.max_tokens).agenerate(prompt)
+
+        if self.provider == "gemini":
+            model = self._gemini_model or await asyncio.to_thread(self._get_gemini_model)
+            return _gemini_text(await model.generate_content_async(prompt), f"gemini:{self.model_name}")
+
+        if self.provider == "mock":
+            return await amock_generate(self.model_name, prompt)
+
+        raise ValueError(f"Unknown provider: {self.provider}")
+
+
+ProviderKey = Tuple[str, str, float, float, int]
+
+_providers: "OrderedDict[ProviderKey, ModelProvider]" = OrderedDict()
+_provider_last_used: Dict[ProviderKey, float] = {}
+_providers_lock = threading.Lock()
+
+
+def get_provider(provider: str, model_name: str, temperature: float = 0.0, top_p: float = 1.0, max_tokens: int = 512) -> ModelProvider:
+    """Process-wide ModelProvider for one configuration, so back-to-back runs reuse warm clients."""
+    key = (provider, model_name, float(temperature), float(top_p), int(max_tokens))
+    with _providers_lock:
+        instance = _providers.get(key)
+        if instance is None:
+            instance = ModelProvider(provider, model_name, temperature=temperature, top_p=top_p, max_tokens=max_tokens)
+            _providers[key] = instance
+            while len(_providers) > max(1, PROVIDER_REGISTRY_MAX_ENTRIES):
+                evicted, _ = _providers.popitem(last=False)
+                _provider_last_used.pop(evicted, None)
+        else:
+            _providers.move_to_end(key)
+        _provider_last_used[key] = time.monotonic()
+    return instance
+
+
+def evict_idle_providers(max_idle_s: float = PROVIDER_IDLE_TTL_S) -> int:
+    """Drop providers and local model weights unused for ``max_idle_s`` seconds; returns how many were dropped."""
+    cutoff = time.monotonic() - max_idle_s
+    with _providers_lock:
+        idle = [key for key, used in _provider_last_used.items() if used < cutoff]
+        for key in idle:
+            _providers.pop(key, None)
+            del _provider_last_used[key]
+    return len(idle) + len(evict_idle_models(max_idle_s))
+
+
+def parse_warmup_spec(spec: str) -> List[Tuple[str, str]]:
+    # "gemini:gemini-1.5-flash,huggingface:gpt2" -> [(provider, model_name), ...]
+    entries = []
+    for part in spec.split(","):
+        provider, sep, model_name = part.strip().partition(":")
+        if provider and sep and model_name:
+            entries.append((provider, model_name))
+    return entries
+
+
+def warm_up_providers(specs: List[Tuple[str, str]]) -> None:
+    for provider, model_name in specs:
+        try:
+            get_provider(provider, model_name).warm_up()
+        except Exception as e:
+            # A provider that cannot warm up still fails (and is reported) on its first real call
+            logger.warning("Warm-up of %s:%s failed: %r", provider, model_name, e)
+
+
+async def evict_idle_providers_forever(interval_s: float = PROVIDER_EVICTION_INTERVAL_S) -> None:
+    while True:
+        await asyncio.sleep(interval_s)
+        dropped = await asyncio.to_thread(evict_idle_providers)
+        if dropped:
+            logger.info("Evicted %d idle providers/models", dropped)
+
+
+async def start_provider_registry() -> asyncio.Task:
+    """Warm up PROVIDER_WARMUP off the event loop and start the idle-eviction task."""
+    specs = parse_warmup_spec(PROVIDER_WARMUP)
+    if specs:
+        await asyncio.to_thread(warm_up_providers, specs)
+    return asyncio.create_task(evict_idle_providers_forever())
+
+
+def registry_stats() -> Dict[str, Any]:
+    with _providers_lock:
+        providers = [f"{key[0]}:{key[1]}" for key in _providers]
+    return {"providers": providers, "local_models": loaded_models()}
@@ -3,6 +3,7 @@ from __future__ import annotations
 from datetime import datetime
 from typing import Optional
 
+from sqlalchemy import UniqueConstraint
 from sqlmodel import Field, SQLModel
 
 
@@ -12,6 +13,7 @@ class Dataset(SQLModel, table=True):
     description: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     storage_path: str
+    index_path: Optional[str] = None  # sidecar file of uint64 row byte offsets
     num_items: int = 0
 
 
@@ -25,19 +27,70 @@ class EvaluationRun(SQLModel, table=True):
     top_p: float = 1.0
     max_tokens: int = 512
     metrics_json: str  # JSON-encoded list of metric names
-    status: str = "pending"  # pending | running | completed | failed
+    judge_provider: Optional[str] = None  # judge overrides; None uses JUDGE_PROVIDER/JUDGE_MODEL
+    judge_model: Optional[str] = None
+    pending_metrics_json: Optional[str] = None  # JSON list of metrics added after scoring; scored on stored outputs
+    reuse_generations: bool = True  # reuse stored outputs of the same deterministic model configuration
+    use_cache: bool = True  # reuse cached deterministic generations and judge scores
+    concurrency: int = 32  # max items in flight for this run
+    provider_limits_json: Optional[str] = None  # JSON-encoded {provider: ProviderLimits}
+    item_offset: int = 0  # dataset rows skipped before evaluation starts
+    item_limit: Optional[int] = None  # max items evaluated (smoke runs)
+    sample_fraction: Optional[float] = None  # keep each row with this probability
+    sample_seed: int = 0
+    shard_index: int = 0  # evaluate only this contiguous shard of the dataset ...
+    num_shards: int = 1  # ... out of this many
+    cascade_json: Optional[str] = None  # JSON list of cascade rules deciding judge metrics from cheap ones
+    early_stopping_json: Optional[str] = None  # JSON-encoded EarlyStoppingConfig; items are then scored in random order
+    stopped_early: bool = False  # the early-stopping rule ended the run before every item was scored
+    status: str = Field(default="pending", index=True)  # pending | running | completed | failed
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     aggregate_results_json: Optional[str] = None  # JSON-encoded dict
     num_items: int = 0
+    num_errors: int = 0  # items with a failed generation or metric
+    progress_json: Optional[str] = None  # JSON-encoded app.progress.RunProgress snapshot, refreshed while running
+    telemetry_json: Optional[str] = None  # per-stage latency, token usage and retry summary
     error_message: Optional[str] = None
+    # Job queue lease, set by the worker executing the run (see app.worker)
+    worker_id: Optional[str] = None
+    heartbeat_at: Optional[datetime] = None
+    lease_expires_at: Optional[datetime] = None
+    attempts: int = 0
 
 
 class EvaluationItemResult(SQLModel, table=True):
+    # One result per item; also backs run-scoped lookups ordered by item_index
+    __table_args__ = (UniqueConstraint("run_id", "item_index", name="uq_evaluationitemresult_run_item"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     run_id: int = Field(foreign_key="evaluationrun.id")
     item_index: int
     input_text: str
     reference_text: Optional[str] = None
     output_text: Optional[str] = None
-    scores_json: Optional[str] = None  # JSON-encoded dict
\ No newline at end of file
+    scores_json: Optional[str] = None  # JSON-encoded dict; a per-item copy of its EvaluationScore rows
+    error_message: Optional[str] = None  # generation/metric failures for this item
+    derived_json: Optional[str] = None  # JSON {metric: rule} for metrics set or skipped by a cascade rule, not scored
+
+
+class EvaluationScore(SQLModel, table=True):
+    # One row per scored (item, metric), so aggregates and filters run in SQL instead of parsing scores_json
+    __table_args__ = (UniqueConstraint("run_id", "metric", "item_index", name="uq_evaluationscore_run_metric_item"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    run_id: int = Field(foreign_key="evaluationrun.id")
+    item_index: int
+    metric: str
+    score: float
+
+
+class Generation(SQLModel, table=True):
+    # Model output stored once per (model configuration, input text) and reused by every run with that configuration
+    __table_args__ = (UniqueConstraint("config_hash", "input_hash", name="uq_generation_config_input"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    config_hash: str  # app.generations.generation_config_hash
+    input_hash: str  # sha256 of the prompt
+    output_text: str
+    created_at: datetime = Field(default_factory=datetime.utcnow)
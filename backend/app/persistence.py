@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Type
+
+from sqlalchemy import bindparam, delete, exists, insert, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session, select
+
+from .database import get_async_session, get_session
+from .models import EvaluationItemResult, EvaluationScore
+
+RESULT_BATCH_SIZE = int(os.getenv("RESULT_BATCH_SIZE", "500"))
+RESULT_FLUSH_INTERVAL_S = float(os.getenv("RESULT_FLUSH_INTERVAL_S", "1.0"))
+# Rows fetched per keyset page when streaming a run's results out
+RESULT_EXPORT_BATCH_SIZE = int(os.getenv("RESULT_EXPORT_BATCH_SIZE", "1000"))
+
+
+def insert_ignoring_duplicates(session: Session, model: Type[Any], index_elements: Sequence[str]) -> Any:
+    # A resumed run may re-score an item whose rows already landed; the index_elements are unique
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        return pg_insert(model).on_conflict_do_nothing(index_elements=list(index_elements))
+    if dialect == "sqlite":
+        return sqlite_insert(model).on_conflict_do_nothing(index_elements=list(index_elements))
+    return insert(model)
+
+
+def _bulk_insert(
+    rows: List[Dict[str, Any]],
+    score_rows: Optional[List[Dict[str, Any]]] = None,
+    updates: Optional[List[Dict[str, Any]]] = None,
+    replaced: Optional[List[Dict[str, Any]]] = None,
+) -> None:
+    with get_session() as session:
+        table = EvaluationItemResult.__table__  # type: ignore[attr-defined]
+        if replaced:
+            # Rows of ``rows`` that supersede a stored result, e.g. an item whose generation failed before a resume
+            session.execute(
+                delete(table).where(table.c.run_id == bindparam("b_run_id"), table.c.item_index == bindparam("b_item_index")),
+                [{"b_run_id": row["run_id"], "b_item_index": row["item_index"]} for row in replaced],
+            )
+        # Core executemany; psycopg batches these into multi-row INSERTs (insertmanyvalues)
+        if rows:
+            session.execute(insert_ignoring_duplicates(session, EvaluationItemResult, ["run_id", "item_index"]), rows)
+        if updates:
+            session.execute(
+                update(table)
+                .where(table.c.run_id == bindparam("b_run_id"), table.c.item_index == bindparam("b_item_index"))
+                .values(
+                    scores_json=bindparam("b_scores_json"),
+                    error_message=bindparam("b_error_message"),
+                    derived_json=bindparam("b_derived_json"),
+                ),
+                [{f"b_{key}": value for key, value in row.items()} for row in updates],
+            )
+        if score_rows:
+            session.execute(insert_ignoring_duplicates(session, EvaluationScore, ["run_id", "metric", "item_index"]), score_rows)
+        session.commit()
+
+
+def insert_scores(score_rows: List[Dict[str, Any]]) -> None:
+    _bulk_insert([], score_rows)
+
+
+class ResultWriter:
+    """Buffers EvaluationItemResult rows and writes them in batches.
+
+    A batch is flushed once it reaches ``batch_size`` rows or ``flush_interval_s`` seconds after the
+    previous flush, whichever comes first. ``close()`` flushes whatever is left. Each item's scores
+    are written as EvaluationScore rows in the same transaction. ``update()`` buffers new
+    ``scores_json``/``error_message``/``derived_json`` values for rows that already exist, e.g. when metrics are added.
+    ``add(..., replace=True)`` writes a row in place of an existing one for the same item.
+    A failed write keeps its rows buffered for the next flush, and a failed timed flush is raised from
+    the next ``add()``/``update()`` or from ``close()``.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = RESULT_BATCH_SIZE,
+        flush_interval_s: float = RESULT_FLUSH_INTERVAL_S,
+        on_write: Optional[Callable[[int, float], None]] = None,
+    ) -> None:
+        self.batch_size = max(1, batch_size)
+        self.flush_interval_s = flush_interval_s
+        # Called with (database rows written, seconds spent) after each committed batch
+        self.on_write = on_write
+        self.rows_written = 0
+        # (row, scores, kind) with kind "insert", "update" or "replace"
+        self._buffer: List[Tuple[Dict[str, Any], Dict[str, float], str]] = []
+        self._flush_lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+        self._closed = False
+
+    async def __aenter__(self) -> "ResultWriter":
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        await self.close()
+
+    async def add(self, row: Dict[str, Any], scores: Optional[Dict[str, float]] = None, replace: bool = False) -> None:
+        await self._append(row, scores, "replace" if replace else "insert")
+
+    async def update(self, row: Dict[str, Any], scores: Optional[Dict[str, float]] = None) -> None:
+        # ``row`` holds run_id, item_index, scores_json, error_message and derived_json; ``scores`` only the new ones
+        await self._append(row, scores, "update")
+
+    async def _append(self, row: Dict[str, Any], scores: Optional[Dict[str, float]], kind: str) -> None:
+        if self._closed:
+            raise RuntimeError("ResultWriter is closed")
+        if self._timer is not None and self._timer.done():
+            # The periodic flush failed; surface its error instead of buffering rows nothing will write
+            self._timer.result()
+        self._buffer.append((row, scores or {}, kind))
+        if self._timer is None and self.flush_interval_s > 0:
+            self._timer = asyncio.create_task(self._flush_periodically())
+        if len(self._buffer) >= self.batch_size:
+            # Awaiting the flush here gives producers backpressure when the database falls behind
+            await self.flush()
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            while self._buffer:
+                batch, self._buffer = self._buffer[: self.batch_size], self._buffer[self.batch_size :]
+                rows = [row for row, _, kind in batch if kind != "update"]
+                updates = [row for row, _, kind in batch if kind == "update"]
+                replaced = [row for row, _, kind in batch if kind == "replace"]
+                score_rows = [
+                    dict(run_id=row["run_id"], item_index=row["item_index"], metric=metric, score=score)
+                    for row, scores, _ in batch
+                    for metric, score in scores.items()
+                ]
+                started = time.perf_counter()
+                try:
+                    await asyncio.to_thread(_bulk_insert, rows, score_rows, updates, replaced)
+                except BaseException:
+                    # Keep the batch so a later flush retries it rather than silently dropping the rows
+                    self._buffer = batch + self._buffer
+                    raise
+                self.rows_written += len(batch)
+                if self.on_write is not None:
+                    self.on_write(len(batch) + len(score_rows), time.perf_counter() - started)
+
+    async def _flush_periodically(self) -> None:
+        while not self._closed:
+            await asyncio.sleep(self.flush_interval_s)
+            if self._buffer:
+                await self.flush()
+
+    async def close(self) -> None:
+        self._closed = True
+        if self._timer is not None:
+            # Cancel only between flushes so an in-progress batch is never abandoned mid-write
+            async with self._flush_lock:
+                self._timer.cancel()
+            timer, self._timer = self._timer, None
+            try:
+                await timer
+            except asyncio.CancelledError:
+                pass
+            except Exception:
+                # Write what is still buffered, then fail the run so it stays resumable
+                await self.flush()
+                raise
+        await self.flush()
+
+
+@dataclass
+class ItemResultFilter:
+    metric: Optional[str] = None
+    below: Optional[float] = None  # keep items whose ``metric`` score is < below
+    above: Optional[float] = None  # ... and/or > above
+    errors_only: bool = False
+
+
+def _item_results_query(run_id: int, after: Optional[int], limit: int, filters: Optional[ItemResultFilter]) -> Any:
+    filters = filters or ItemResultFilter()
+    query = select(EvaluationItemResult).where(EvaluationItemResult.run_id == run_id)
+    if after is not None:
+        query = query.where(EvaluationItemResult.item_index > after)
+    if filters.metric and (filters.below is not None or filters.above is not None):
+        # Correlated lookup on the (run_id, metric, item_index) unique index of the score table
+        matching = exists().where(
+            EvaluationScore.run_id == EvaluationItemResult.run_id,
+            EvaluationScore.item_index == EvaluationItemResult.item_index,
+            EvaluationScore.metric == filters.metric,
+        )
+        if filters.below is not None:
+            matching = matching.where(EvaluationScore.score < filters.below)
+        if filters.above is not None:
+            matching = matching.where(EvaluationScore.score > filters.above)
+        query = query.where(matching)
+    if filters.errors_only:
+        query = query.where(EvaluationItemResult.error_message.is_not(None))
+    return query.order_by(EvaluationItemResult.item_index).limit(limit)
+
+
+def fetch_item_results(
+    run_id: int, after: Optional[int] = None, limit: int = 100, filters: Optional[ItemResultFilter] = None
+) -> List[EvaluationItemResult]:
+    """One page of a run's results ordered by ``item_index``, starting after the ``after`` cursor.
+
+    Keyset pagination over the unique ``(run_id, item_index)`` index, so deep pages cost the same as
+    the first one.
+    """
+    with get_session() as session:
+        return list(session.exec(_item_results_query(run_id, after, limit, filters)))
+
+
+async def afetch_item_results(
+    run_id: int, after: Optional[int] = None, limit: int = 100, filters: Optional[ItemResultFilter] = None
+) -> List[EvaluationItemResult]:
+    """``fetch_item_results`` on the async engine, for request handlers."""
+    async with get_async_session() as session:
+        return list(await session.exec(_item_results_query(run_id, after, limit, filters)))
+
+
+def iter_item_results(
+    run_id: int, filters: Optional[ItemResultFilter] = None, batch_size: int = RESULT_EXPORT_BATCH_SIZE
+) -> Iterator[EvaluationItemResult]:
+    """Stream every matching result one keyset page at a time; at most one page is held in memory."""
+    after: Optional[int] = None
+    while True:
+        page = fetch_item_results(run_id, after=after, limit=batch_size, filters=filters)
+        yield from page
+        if len(page) < batch_size:
+            return
+        after = page[-1].item_index
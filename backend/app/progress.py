@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import math
+import os
+import time
+from typing import Any, Dict, Iterable, Optional
+
+# How often a running evaluation writes its progress snapshot to the run row
+PROGRESS_PERSIST_INTERVAL_S = float(os.getenv("PROGRESS_PERSIST_INTERVAL_S", "2.0"))
+
+PERCENTILES = (10, 50, 90, 99)
+
+
+class MetricStats:
+    """Streaming mean/variance (Welford) and histogram-based percentiles for one metric.
+
+    Scores are expected in ``[lo, hi]``; values outside are counted in the edge bins (min/max stay
+    exact), so percentiles are accurate to one bin width, ``(hi - lo) / bins``.
+    """
+
+    def __init__(self, lo: float = 0.0, hi: float = 1.0, bins: int = 200) -> None:
+        self.lo = lo
+        self.hi = hi
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self._hist = [0] * bins
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        bins = len(self._hist)
+        position = int((value - self.lo) / (self.hi - self.lo) * bins)
+        self._hist[min(max(position, 0), bins - 1)] += 1
+
+    @property
+    def sum_of_squares(self) -> float:
+        return self._m2 + self.count * self.mean * self.mean
+
+    @property
+    def variance(self) -> float:
+        # Sample variance; 0 until there are two observations
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q / 100.0 * self.count
+        width = (self.hi - self.lo) / len(self._hist)
+        seen = 0
+        for i, n in enumerate(self._hist):
+            if n and seen + n >= rank:
+                # Interpolate linearly inside the bin, then keep within the observed range
+                estimate = self.lo + (i + (rank - seen) / n) * width
+                return min(max(estimate, self.min), self.max)  # type: ignore[type-var]
+            seen += n
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        summary: Dict[str, Any] = {
+            "count": self.count,
+            "mean": self.mean if self.count else None,
+            "variance": self.variance,
+            "stddev": math.sqrt(self.variance),
+            "min": self.min,
+            "max": self.max,
+        }
+        for q in PERCENTILES:
+            summary[f"p{q}"] = self.percentile(q)
+        return summary
+
+
+class LatencyStats:
+    """Streaming latency percentiles from log-spaced buckets (each about 5% wide, from 0.1 ms up)."""
+
+    _BASE_S = 1e-4
+    _GROWTH = 1.05
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._buckets: Dict[int, int] = {}
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        bucket = math.ceil(math.log(seconds / self._BASE_S, self._GROWTH)) if seconds > self._BASE_S else 0
+        self._buckets[bucket] = self._buckets.get(bucket, 0) + 1
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q / 100.0 * self.count
+        seen = 0
+        for bucket in sorted(self._buckets):
+            seen += self._buckets[bucket]
+            if seen >= rank:
+                # Upper edge of the bucket, never above the largest value seen
+                return min(self._BASE_S * self._GROWTH ** bucket, self.max)
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        summary: Dict[str, Any] = {"count": self.count, "mean": self.total / self.count if self.count else None, "max": self.max}
+        for q in PERCENTILES:
+            summary[f"p{q}"] = self.percentile(q)
+        return summary
+
+
+class RunProgress:
+    """Live counters for one evaluation run: completed items, errors, per-metric stats, throughput and ETA."""
+
+    def __init__(self, metrics: Iterable[str], total: Optional[int] = None) -> None:
+        self.metrics: Dict[str, MetricStats] = {name: MetricStats() for name in metrics}
+        self.total = total
+        self.completed = 0
+        self.num_errors = 0
+        # Throughput only counts items finished by this attempt, not those restored on resume
+        self._started = time.monotonic()
+        self._completed_at_start = 0
+        self.item_latency = LatencyStats()
+        self.rows_written = 0
+        self.write_s = 0.0
+        # Items per metric whose score was derived (or skipped) by a cascade rule instead of scored
+        self.derived: Dict[str, int] = {}
+        # Latest interval check of an early-stopping run
+        self.early_stopping: Optional[Dict[str, Any]] = None
+
+    def restore(self, scores: Dict[str, float], had_error: bool, derived: Iterable[str] = ()) -> None:
+        # An item finished by an earlier attempt of the run
+        self.record(scores, had_error, derived=derived)
+        self._completed_at_start += 1
+
+    def record(
+        self, scores: Dict[str, float], had_error: bool, latency_s: Optional[float] = None, derived: Iterable[str] = ()
+    ) -> None:
+        self.completed += 1
+        self._count_derived(derived)
+        if latency_s is not None:
+            self.item_latency.add(latency_s)
+        if had_error:
+            self.num_errors += 1
+        for name, value in scores.items():
+            stats = self.metrics.get(name)
+            if stats is not None:
+                stats.add(value)
+
+    def add_scores(self, scores: Dict[str, float], new_error: bool = False, derived: Iterable[str] = ()) -> None:
+        # Metrics added to an item that was already counted as completed
+        self._count_derived(derived)
+        if new_error:
+            self.num_errors += 1
+        for name, value in scores.items():
+            stats = self.metrics.get(name)
+            if stats is not None:
+                stats.add(value)
+
+    def _count_derived(self, derived: Iterable[str]) -> None:
+        for name in derived:
+            self.derived[name] = self.derived.get(name, 0) + 1
+
+    def record_write(self, rows: int, seconds: float) -> None:
+        # Called by the result writer after each batch it commits
+        self.rows_written += rows
+        self.write_s += seconds
+
+    def means(self) -> Dict[str, float]:
+        # Metrics that were never scored report 0.0, matching the final aggregate
+        return {name: stats.mean if stats.count else 0.0 for name, stats in self.metrics.items()}
+
+    def items_per_s(self) -> float:
+        elapsed = time.monotonic() - self._started
+        return (self.completed - self._completed_at_start) / elapsed if elapsed > 0 else 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        elapsed = time.monotonic() - self._started
+        rate = self.items_per_s()
+        remaining = max(self.total - self.completed, 0) if self.total is not None else None
+        return {
+            "completed": self.completed,
+            "total": self.total,
+            "num_errors": self.num_errors,
+            "elapsed_s": round(elapsed, 3),
+            "items_per_s": round(rate, 3),
+            "eta_s": round(remaining / rate, 1) if remaining is not None and rate > 0 else None,
+            "metrics": {name: stats.to_dict() for name, stats in self.metrics.items()},
+            "item_latency_s": self.item_latency.to_dict(),
+            "writes": {
+                "rows": self.rows_written,
+                "busy_s": round(self.write_s, 3),
+                "rows_per_s": round(self.rows_written / elapsed, 1) if elapsed > 0 else 0.0,
+            },
+            "derived": dict(self.derived),
+            "early_stopping": self.early_stopping,
+        }
@@ -0,0 +1,261 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from .telemetry import record_retry
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_OVERLOAD_STATUS = {408, 429, 503, 529}
+_RETRYABLE_STATUS = _OVERLOAD_STATUS | {500, 502, 504}
+_OVERLOAD_NAMES = ("RateLimit", "ResourceExhausted", "Overloaded", "ServiceUnavailable", "Timeout", "DeadlineExceeded")
+_RETRYABLE_NAMES = _OVERLOAD_NAMES + ("APIConnection", "InternalServer", "ServerError", "ConnectError")
+
+
+@dataclass
+class ProviderLimitSettings:
+    max_concurrency: int = 64
+    min_concurrency: int = 1
+    requests_per_minute: Optional[float] = None
+    tokens_per_minute: Optional[float] = None
+    max_retries: int = 5
+    timeout_s: float = 120.0
+    backoff_base_s: float = 0.5
+    backoff_max_s: float = 30.0
+
+
+def default_settings(provider: str) -> ProviderLimitSettings:
+    # Env overrides, e.g. PROVIDER_GEMINI_RPM=15 or PROVIDER_LITELLM_MAX_CONCURRENCY=128
+    prefix = f"PROVIDER_{provider.upper()}_"
+
+    def _env(name: str) -> Optional[str]:
+        return os.getenv(prefix + name)
+
+    settings = ProviderLimitSettings()
+    if _env("MAX_CONCURRENCY"):
+        settings.max_concurrency = int(_env("MAX_CONCURRENCY"))  # type: ignore[arg-type]
+    if _env("RPM"):
+        settings.requests_per_minute = float(_env("RPM"))  # type: ignore[arg-type]
+    if _env("TPM"):
+        settings.tokens_per_minute = float(_env("TPM"))  # type: ignore[arg-type]
+    if _env("MAX_RETRIES"):
+        settings.max_retries = int(_env("MAX_RETRIES"))  # type: ignore[arg-type]
+    if _env("TIMEOUT_S"):
+        settings.timeout_s = float(_env("TIMEOUT_S"))  # type: ignore[arg-type]
+    return settings
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    for candidate in (
+        getattr(exc, "status_code", None),
+        getattr(getattr(exc, "response", None), "status_code", None),
+        getattr(exc, "code", None),
+    ):
+        if isinstance(candidate, int):
+            return candidate
+    return None
+
+
+def is_overload_error(exc: BaseException) -> bool:
+    if isinstance(exc, TimeoutError):
+        return True
+    if _status_code(exc) in _OVERLOAD_STATUS:
+        return True
+    name = type(exc).__name__
+    return any(marker in name for marker in _OVERLOAD_NAMES)
+
+
+def is_retryable_error(exc: BaseException) -> bool:
+    if is_overload_error(exc):
+        return True
+    if _status_code(exc) in _RETRYABLE_STATUS:
+        return True
+    name = type(exc).__name__
+    return any(marker in name for marker in _RETRYABLE_NAMES)
+
+
+def backoff_delay(attempt: int, base_s: float, max_s: float) -> float:
+    # Full jitter exponential backoff
+    return random.uniform(0.0, min(max_s, base_s * (2 ** attempt)))
+
+
+class TokenBucket:
+    """Continuous-refill token bucket sized in units per minute."""
+
+    def __init__(self, per_minute: float) -> None:
+        self.capacity = float(per_minute)
+        self.rate = float(per_minute) / 60.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount: float = 1.0) -> None:
+        # Requests larger than the bucket are clamped so they can still proceed once it is full
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                await asyncio.sleep((amount - self._tokens) / self.rate)
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD concurrency limit: grows by ~1 per window of successes, halves on overload."""
+
+    def __init__(self, max_limit: int, min_limit: int = 1, initial: Optional[int] = None) -> None:
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.limit = float(initial if initial is not None else max(self.min_limit, min(8, self.max_limit)))
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        async with self._cond:
+            while self.in_flight >= int(self.limit):
+                await self._cond.wait()
+            self.in_flight += 1
+
+    async def release(self, overloaded: bool = False) -> None:
+        async with self._cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if overloaded:
+                # Decrease at most once per second so a burst of 429s from one window counts once
+                if now - self._last_decrease > 1.0:
+                    self.limit = max(float(self.min_limit), self.limit / 2.0)
+                    self._last_decrease = now
+            else:
+                self.limit = min(float(self.max_limit), self.limit + 1.0 / max(self.limit, 1.0))
+            self._cond.notify_all()
+
+    def configure(self, max_limit: int, min_limit: int) -> None:
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.limit = min(max(self.limit, float(self.min_limit)), float(self.max_limit))
+
+
+class ProviderLimiter:
+    """Request/token rate limits, adaptive concurrency and retries for one provider."""
+
+    def __init__(self, provider: str, settings: ProviderLimitSettings) -> None:
+        self.provider = provider
+        self.settings = settings
+        self.concurrency = AdaptiveConcurrencyLimiter(settings.max_concurrency, settings.min_concurrency)
+        self.request_bucket: Optional[TokenBucket] = None
+        self.token_bucket: Optional[TokenBucket] = None
+        self.retries = 0
+        self.errors = 0
+        self.configure(settings)
+
+    def configure(self, settings: ProviderLimitSettings) -> None:
+        old = self.settings
+        self.settings = settings
+        self.concurrency.configure(settings.max_concurrency, settings.min_concurrency)
+        if self.request_bucket is None or settings.requests_per_minute != old.requests_per_minute:
+            self.request_bucket = TokenBucket(settings.requests_per_minute) if settings.requests_per_minute else None
+        if self.token_bucket is None or settings.tokens_per_minute != old.tokens_per_minute:
+            self.token_bucket = TokenBucket(settings.tokens_per_minute) if settings.tokens_per_minute else None
+
+    async def call(self, fn: Callable[[], Awaitable[T]], estimated_tokens: int = 0) -> T:
+        attempt = 0
+        while True:
+            if self.request_bucket is not None:
+                await self.request_bucket.acquire(1)
+            if self.token_bucket is not None and estimated_tokens:
+                await self.token_bucket.acquire(estimated_tokens)
+            await self.concurrency.acquire()
+            overloaded = False
+            try:
+                return await asyncio.wait_for(fn(), timeout=self.settings.timeout_s)
+            except Exception as exc:
+                overloaded = is_overload_error(exc)
+                if attempt >= self.settings.max_retries or not is_retryable_error(exc):
+                    self.errors += 1
+                    raise
+                error = exc
+            finally:
+                await self.concurrency.release(overloaded=overloaded)
+            self.retries += 1
+            record_retry(self.provider)
+            delay = backoff_delay(attempt, self.settings.backoff_base_s, self.settings.backoff_max_s)
+            logger.warning(
+                "%s call failed (%s), retry %d/%d in %.2fs",
+                self.provider, type(error).__name__, attempt + 1, self.settings.max_retries, delay,
+            )
+            attempt += 1
+            await asyncio.sleep(delay)
+
+
+def call_with_retries(fn: Callable[[], T], settings: ProviderLimitSettings, provider: str = "") -> T:
+    """Blocking retry loop for the synchronous provider path."""
+    attempt = 0
+    while True:
+        try:
+            return fn()
+        except Exception as exc:
+            if attempt >= settings.max_retries or not is_retryable_error(exc):
+                raise
+            if provider:
+                record_retry(provider)
+            time.sleep(backoff_delay(attempt, settings.backoff_base_s, settings.backoff_max_s))
+            attempt += 1
+
+
+# asyncio primitives are bound to the loop that first uses them, so limiters are kept per (provider, loop)
+_limiters: Dict[Tuple[str, int], ProviderLimiter] = {}
+_overrides: Dict[str, ProviderLimitSettings] = {}
+
+
+def configure_provider_limits(provider: str, settings: ProviderLimitSettings) -> None:
+    _overrides[provider] = settings
+    for (name, _), limiter in _limiters.items():
+        if name == provider:
+            limiter.configure(settings)
+
+
+def provider_settings(provider: str) -> ProviderLimitSettings:
+    return _overrides.get(provider) or default_settings(provider)
+
+
+def get_provider_limiter(provider: str) -> ProviderLimiter:
+    loop = asyncio.get_running_loop()
+    key = (provider, id(loop))
+    limiter = _limiters.get(key)
+    if limiter is None:
+        # Drop limiters left behind by loops that have since closed
+        for stale in [k for k in _limiters if k[0] == provider and k[1] != id(loop)]:
+            del _limiters[stale]
+        limiter = ProviderLimiter(provider, provider_settings(provider))
+        _limiters[key] = limiter
+    return limiter
+
+
+def limiter_stats() -> List[Dict[str, Any]]:
+    return [
+        {"provider": provider, "in_flight": limiter.concurrency.in_flight, "limit": int(limiter.concurrency.limit)}
+        for (provider, _), limiter in list(_limiters.items())
+    ]
+
+
+def settings_from_dict(provider: str, values: Dict[str, Any]) -> ProviderLimitSettings:
+    settings = default_settings(provider)
+    for key, value in values.items():
+        if value is not None and hasattr(settings, key):
+            setattr(settings, key, value)
+    return settings
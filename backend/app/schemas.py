@@ -1,7 +1,9 @@
 from __future__ import annotations
 
 from typing import List, Literal, Optional, Dict, Any
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
+
+from .cascade import CHEAP_METRICS
 
 
 class DatasetCreateResponse(BaseModel):
@@ -17,10 +19,68 @@ class DatasetInfo(BaseModel):
     num_items: int
 
 
+class ProviderLimits(BaseModel):
+    max_concurrency: Optional[int] = Field(default=None, ge=1, description="Upper bound for the adaptive in-flight limit")
+    min_concurrency: Optional[int] = Field(default=None, ge=1)
+    requests_per_minute: Optional[float] = Field(default=None, gt=0)
+    tokens_per_minute: Optional[float] = Field(default=None, gt=0)
+    max_retries: Optional[int] = Field(default=None, ge=0)
+    timeout_s: Optional[float] = Field(default=None, gt=0)
+
+
+class CascadeRule(BaseModel):
+    metric: Literal["exact_match", "bleu", "rougeL", "semantic_similarity", "data_validation"] = Field(description="Cheap metric the rule tests")
+    op: Literal["<", "<=", ">", ">=", "==", "!="] = ">="
+    value: float
+    derive: Dict[str, float] = Field(default_factory=dict, description="Judge metrics set to these scores when the rule matches")
+    skip: List[str] = Field(default_factory=list, description="Judge metrics left unscored when the rule matches")
+
+    @model_validator(mode="after")
+    def _check_targets(self) -> "CascadeRule":
+        if not self.derive and not self.skip:
+            raise ValueError("cascade rule needs derive or skip")
+        return self
+
+
+class EarlyStoppingConfig(BaseModel):
+    ci_width: Optional[float] = Field(
+        default=None, gt=0, le=1, description="Stop once each watched metric's confidence interval is at most this wide"
+    )
+    thresholds: Dict[str, float] = Field(
+        default_factory=dict, description="Pass/fail threshold per metric; decided once the interval lies on one side"
+    )
+    metrics: Optional[List[str]] = Field(
+        default=None, description="Metrics that must be decided; defaults to all run metrics with ci_width, else the thresholds' keys"
+    )
+    confidence: float = Field(default=0.95, gt=0, lt=1)
+    min_items: int = Field(default=200, ge=2, description="Never stop before this many items are scored")
+    seed: int = Field(default=0, description="Seed of the random item order")
+
+    @model_validator(mode="after")
+    def _check_rule(self) -> "EarlyStoppingConfig":
+        if self.ci_width is None and not self.thresholds:
+            raise ValueError("early_stopping needs ci_width or thresholds")
+        return self
+
+
+class DatasetItem(BaseModel):
+    item_index: int
+    input: str
+    reference: str
+
+
+class DatasetItemsPage(BaseModel):
+    dataset_id: int
+    offset: int
+    limit: int
+    total: int
+    items: List[DatasetItem]
+
+
 class EvaluationCreateRequest(BaseModel):
     name: str = Field(description="A friendly name for the evaluation run")
     dataset_id: int
-    model_provider: Literal["gemini", "openai", "litellm", "huggingface"] = "gemini"
+    model_provider: Literal["gemini", "openai", "litellm", "huggingface", "mock"] = "gemini"
     model_name: str = Field(default="gemini-1.5-flash")
     temperature: float = 0.0
     top_p: float = 1.0
@@ -30,6 +90,61 @@ class EvaluationCreateRequest(BaseModel):
         "answer_relevancy", "hallucinations", "toxicity", "biasness",
         "precision", "recall", "task_completion", "correctness", "confidence_score", "data_validation"
     ])
+    judge_provider: Optional[Literal["gemini", "openai", "litellm", "huggingface", "mock"]] = Field(
+        default=None, description="Provider for LLM-judge metrics; defaults to the JUDGE_PROVIDER env setting"
+    )
+    judge_model: Optional[str] = Field(default=None, description="Model for LLM-judge metrics; defaults to JUDGE_MODEL")
+    use_cache: bool = Field(default=True, description="Reuse cached temperature=0 generations, stored generations and judge calls")
+    reuse_generations: bool = Field(
+        default=True, description="Reuse outputs stored by earlier runs of the same model settings (temperature=0 only)"
+    )
+    concurrency: int = Field(default=32, ge=1, le=4096, description="Max dataset items processed concurrently")
+    provider_limits: Dict[str, ProviderLimits] = Field(
+        default_factory=dict,
+        description="Rate/concurrency limits keyed by provider name (e.g. 'gemini', 'litellm'); applies to judge calls too",
+    )
+    offset: int = Field(default=0, ge=0, description="Skip this many dataset rows")
+    limit: Optional[int] = Field(default=None, ge=1, description="Evaluate at most this many items")
+    sample_fraction: Optional[float] = Field(default=None, gt=0, le=1, description="Randomly keep this fraction of rows")
+    sample_seed: int = 0
+    num_shards: int = Field(default=1, ge=1, description="Split the dataset into this many disjoint contiguous shards")
+    shard_index: int = Field(default=0, ge=0, description="Which shard this run evaluates")
+    cascade: List[CascadeRule] = Field(
+        default_factory=list,
+        description="Rules applied in order after the cheap metrics, e.g. derive correctness=1 when exact_match == 1",
+    )
+    early_stopping: Optional[EarlyStoppingConfig] = Field(
+        default=None, description="Score items in random order and stop once the metric estimates are precise enough"
+    )
+
+    @model_validator(mode="after")
+    def _check_shard(self) -> "EvaluationCreateRequest":
+        if self.shard_index >= self.num_shards:
+            raise ValueError("shard_index must be smaller than num_shards")
+        return self
+
+    @model_validator(mode="after")
+    def _check_cascade(self) -> "EvaluationCreateRequest":
+        for rule in self.cascade:
+            if rule.metric not in self.metrics:
+                raise ValueError(f"cascade rule tests {rule.metric}, which is not in the run's metrics")
+            targets = [*rule.derive, *rule.skip]
+            unknown = sorted(set(targets) - set(self.metrics))
+            if unknown:
+                raise ValueError(f"cascade rule refers to metrics not in the run: {', '.join(unknown)}")
+            cheap = sorted(set(CHEAP_METRICS) & set(targets))
+            if cheap:
+                raise ValueError(f"cascade rules only decide judge metrics, not {', '.join(cheap)}")
+        return self
+
+    @model_validator(mode="after")
+    def _check_early_stopping(self) -> "EvaluationCreateRequest":
+        if self.early_stopping is not None:
+            referenced = set(self.early_stopping.thresholds) | set(self.early_stopping.metrics or [])
+            unknown = sorted(referenced - set(self.metrics))
+            if unknown:
+                raise ValueError(f"early_stopping refers to metrics not in the run: {', '.join(unknown)}")
+        return self
 
 
 class EvaluationCreateResponse(BaseModel):
@@ -37,13 +152,25 @@ class EvaluationCreateResponse(BaseModel):
     status: str
 
 
+class EvaluationMetricsAddRequest(BaseModel):
+    metrics: List[str] = Field(min_length=1, description="Metrics scored on the run's stored outputs")
+
+
 class EvaluationStatusResponse(BaseModel):
     run_id: int
     status: str
     num_items: int
+    num_errors: int = 0
     metrics: List[str]
     aggregate_results: Optional[Dict[str, Any]] = None
     error_message: Optional[str] = None
+    progress: Optional[Dict[str, Any]] = Field(
+        default=None, description="completed/total, items_per_s, eta_s and running per-metric stats (mean, variance, percentiles)"
+    )
+    telemetry: Optional[Dict[str, Any]] = Field(
+        default=None, description="Per-stage latency percentiles and error counts, token usage and retries"
+    )
+    stopped_early: bool = False
 
 
 class EvaluationItemScore(BaseModel):
@@ -52,10 +179,84 @@ class EvaluationItemScore(BaseModel):
     reference_text: Optional[str] = None
     output_text: Optional[str] = None
     scores: Dict[str, float]
+    error_message: Optional[str] = None
+    derived: Dict[str, str] = Field(
+        default_factory=dict, description="Metrics set (or, if absent from scores, skipped) by a cascade rule, with the rule"
+    )
 
 
 class EvaluationResultsResponse(BaseModel):
     run_id: int
     metrics: List[str]
     aggregate_results: Dict[str, float]
-    samples: List[EvaluationItemScore]
\ No newline at end of file
+    samples: List[EvaluationItemScore]
+
+
+class MetricSummary(BaseModel):
+    count: int
+    mean: Optional[float] = None
+    stddev: Optional[float] = None
+    min: Optional[float] = None
+    max: Optional[float] = None
+    p10: Optional[float] = None
+    p25: Optional[float] = None
+    p50: Optional[float] = None
+    p75: Optional[float] = None
+    p90: Optional[float] = None
+    p99: Optional[float] = None
+    histogram: List[int] = Field(description="Counts over 10 equal-width bins spanning [0, 1]")
+
+
+class EvaluationSummaryResponse(BaseModel):
+    run_id: int
+    status: str
+    metrics: Dict[str, MetricSummary]
+
+
+class MetricComparison(BaseModel):
+    n: int = Field(description="Items scored on this metric by both runs")
+    base_mean: Optional[float] = None
+    candidate_mean: Optional[float] = None
+    delta: Optional[float] = Field(default=None, description="Mean paired difference, candidate - base")
+    ci_low: Optional[float] = None
+    ci_high: Optional[float] = None
+    significant: bool = False
+    improved: int = 0
+    regressed: int = 0
+    unchanged: int = 0
+
+
+class RegressedItem(BaseModel):
+    item_index: int
+    base_score: float
+    candidate_score: float
+    delta: float
+    input_text: Optional[str] = None
+
+
+class EvaluationComparisonResponse(BaseModel):
+    base_run_id: int
+    candidate_run_id: int
+    dataset_id: int
+    confidence: float
+    n_boot: int
+    metrics: Dict[str, MetricComparison]
+    top_regressions: Dict[str, List[RegressedItem]]
+
+
+class EvaluationItemsPage(BaseModel):
+    run_id: int
+    limit: int
+    items: List[EvaluationItemScore]
+    next_cursor: Optional[int] = Field(default=None, description="Pass as `cursor` to fetch the next page; null on the last page")
+
+
+class CacheStatsResponse(BaseModel):
+    enabled: bool
+    entries: int = 0
+    size_bytes: int = 0
+    max_bytes: int = 0
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    hit_rate: float = 0.0
@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket is unbounded
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Stages recorded by the evaluation pipeline: dataset_load, generation, metric and persistence
+StageKey = Tuple[str, str]  # (stage, name), e.g. ("metric", "rougeL") or ("generation", "gemini:gemini-1.5-flash")
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram in the Prometheus layout, plus error and sum counters."""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.errors = 0
+
+    def observe(self, seconds: float, count: int = 1) -> None:
+        # ``count`` > 1 records one amortised observation per item of a batch
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += count
+        self.count += count
+        self.sum += seconds * count
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        # Linear interpolation inside the bucket, as Prometheus' histogram_quantile does
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for i, n in enumerate(self.counts):
+            upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+            if n and seen + n >= rank:
+                # Never above the largest observation, which a wide bucket would otherwise overshoot
+                return min(lower + (upper - lower) * (rank - seen) / n, self.max)
+            seen += n
+            lower = upper
+        return self.max
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "total_s": round(self.sum, 4),
+            "mean_s": round(self.sum / self.count, 6) if self.count else None,
+            "p50_s": _round(self.quantile(0.5)),
+            "p95_s": _round(self.quantile(0.95)),
+            "p99_s": _round(self.quantile(0.99)),
+            "max_s": _round(self.max),
+        }
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 6) if value is not None else None
+
+
+class Telemetry:
+    """Stage latencies, token usage, retries and errors; one process-wide instance plus one per run."""
+
+    def __init__(self) -> None:
+        self.stages: Dict[StageKey, Histogram] = {}
+        # (stage, provider:model, "prompt" | "completion") -> tokens
+        self.tokens: Dict[Tuple[str, str, str], int] = {}
+        self.retries: Dict[str, int] = {}
+        self.queue_depth_last = 0
+        self.queue_depth_max = 0
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, name: str, seconds: float, error: bool = False, count: int = 1) -> None:
+        with self._lock:
+            histogram = self.stages.get((stage, name))
+            if histogram is None:
+                histogram = self.stages[(stage, name)] = Histogram()
+            histogram.observe(seconds, count)
+            if error:
+                histogram.errors += count
+
+    def add_tokens(self, stage: str, model: str, prompt_tokens: int, completion_tokens: int) -> None:
+        with self._lock:
+            for kind, value in (("prompt", prompt_tokens), ("completion", completion_tokens)):
+                if value:
+                    key = (stage, model, kind)
+                    self.tokens[key] = self.tokens.get(key, 0) + value
+
+    def add_retry(self, provider: str) -> None:
+        with self._lock:
+            self.retries[provider] = self.retries.get(provider, 0) + 1
+
+    def sample_queue_depth(self, depth: Optional[int]) -> None:
+        if depth is not None:
+            self.queue_depth_last = depth
+            self.queue_depth_max = max(self.queue_depth_max, depth)
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            stages: Dict[str, Dict[str, Any]] = {}
+            for (stage, name), histogram in sorted(self.stages.items()):
+                stages.setdefault(stage, {})[name] = histogram.summary()
+            tokens: Dict[str, Dict[str, int]] = {}
+            for (stage, model, kind), value in sorted(self.tokens.items()):
+                entry = tokens.setdefault(f"{stage}:{model}", {"prompt": 0, "completion": 0})
+                entry[kind] = value
+            return {
+                "stages": stages,
+                "tokens": tokens,
+                "retries": dict(self.retries),
+                "thread_pool_queue_depth": {"last": self.queue_depth_last, "max": self.queue_depth_max},
+            }
+
+
+PROCESS_TELEMETRY = Telemetry()
+
+# Set by a running evaluation; copied into tasks and asyncio.to_thread calls started inside it
+run_telemetry: ContextVar[Optional[Telemetry]] = ContextVar("run_telemetry", default=None)
+# Stage of the surrounding ``timed`` block, so token usage is attributed to generation or judging
+current_stage: ContextVar[str] = ContextVar("current_stage", default="generation")
+
+
+def _targets() -> List[Telemetry]:
+    run = run_telemetry.get()
+    return [PROCESS_TELEMETRY, run] if run is not None else [PROCESS_TELEMETRY]
+
+
+def observe(stage: str, name: str, seconds: float, error: bool = False, count: int = 1) -> None:
+    for telemetry in _targets():
+        telemetry.observe(stage, name, seconds, error, count)
+
+
+def record_tokens(model: str, prompt_tokens: Optional[int], completion_tokens: Optional[int]) -> None:
+    stage = current_stage.get()
+    for telemetry in _targets():
+        telemetry.add_tokens(stage, model, int(prompt_tokens or 0), int(completion_tokens or 0))
+
+
+def record_retry(provider: str) -> None:
+    for telemetry in _targets():
+        telemetry.add_retry(provider)
+
+
+@contextmanager
+def timed(stage: str, name: str = "") -> Iterator[None]:
+    """Time the block (sync or awaiting) and count it as an error if it raises."""
+    token = current_stage.set(stage)
+    started = time.perf_counter()
+    error = False
+    try:
+        yield
+    except BaseException:
+        error = True
+        raise
+    finally:
+        current_stage.reset(token)
+        observe(stage, name, time.perf_counter() - started, error)
+
+
+def thread_pool_queue_depth() -> Optional[int]:
+    # Work items waiting for a thread in the loop's default executor (used by asyncio.to_thread).
+    # Reads private attributes of the stdlib loop and executor; None where they do not exist (e.g. uvloop)
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+    executor = getattr(loop, "_default_executor", None)
+    queue = getattr(executor, "_work_queue", None)
+    if executor is None or queue is None:
+        return None
+    try:
+        return queue.qsize()
+    except Exception:
+        return None
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels: str) -> str:
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels.items()) + "}"
+
+
+def prometheus_text(gauges: Optional[Dict[str, Tuple[str, List[Tuple[Dict[str, str], float]]]]] = None) -> str:
+    """Process-wide telemetry in the Prometheus text exposition format (version 0.0.4).
+
+    ``gauges`` maps metric name -> (help text, [(labels, value), ...]) for values sampled at scrape time.
+    """
+    lines: List[str] = []
+    telemetry = PROCESS_TELEMETRY
+    with telemetry._lock:
+        stages = sorted(telemetry.stages.items())
+        tokens = sorted(telemetry.tokens.items())
+        retries = sorted(telemetry.retries.items())
+        lines += [
+            "# HELP llmchecks_stage_duration_seconds Time spent per pipeline stage",
+            "# TYPE llmchecks_stage_duration_seconds histogram",
+        ]
+        for (stage, name), histogram in stages:
+            cumulative = 0
+            for bound, n in zip((*histogram.buckets, float("inf")), histogram.counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"llmchecks_stage_duration_seconds_bucket{_labels(stage=stage, name=name, le=le)} {cumulative}")
+            lines.append(f"llmchecks_stage_duration_seconds_sum{_labels(stage=stage, name=name)} {histogram.sum}")
+            lines.append(f"llmchecks_stage_duration_seconds_count{_labels(stage=stage, name=name)} {histogram.count}")
+        lines += ["# HELP llmchecks_stage_errors_total Failed calls per pipeline stage", "# TYPE llmchecks_stage_errors_total counter"]
+        for (stage, name), histogram in stages:
+            lines.append(f"llmchecks_stage_errors_total{_labels(stage=stage, name=name)} {histogram.errors}")
+        lines += ["# HELP llmchecks_tokens_total Tokens reported by providers", "# TYPE llmchecks_tokens_total counter"]
+        for (stage, model, kind), value in tokens:
+            lines.append(f"llmchecks_tokens_total{_labels(stage=stage, model=model, kind=kind)} {value}")
+        lines += ["# HELP llmchecks_provider_retries_total Retried provider calls", "# TYPE llmchecks_provider_retries_total counter"]
+        for provider, value in retries:
+            lines.append(f"llmchecks_provider_retries_total{_labels(provider=provider)} {value}")
+    for name, (help_text, samples) in (gauges or {}).items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+        for labels, value in samples:
+            lines.append(f"{name}{_labels(**labels) if labels else ''} {value}")
+    return "\n".join(lines) + "\n"
+
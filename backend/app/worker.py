@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional, Set
+
+from sqlalchemy import and_, or_, update
+from sqlmodel import select
+
+from .database import get_session, init_db
+from .evaluation import run_evaluation_async
+from .model_provider import start_provider_registry
+from .models import EvaluationRun
+
+logger = logging.getLogger(__name__)
+
+LEASE_SECONDS = float(os.getenv("WORKER_LEASE_S", "60"))
+HEARTBEAT_SECONDS = float(os.getenv("WORKER_HEARTBEAT_S", "15"))
+POLL_SECONDS = float(os.getenv("WORKER_POLL_S", "2"))
+MAX_RUNS_PER_WORKER = int(os.getenv("WORKER_MAX_RUNS", "1"))
+
+
+def claim_next_run(worker_id: str, run_id: Optional[int] = None) -> Optional[int]:
+    """Lease the oldest pending run, or a running run whose worker stopped heartbeating.
+
+    With ``run_id``, only that run is considered; None means it is claimed elsewhere or finished.
+
+    ``FOR UPDATE SKIP LOCKED`` lets concurrent workers on Postgres claim different rows without
+    blocking. The conditional UPDATE on ``attempts`` makes the claim safe on databases that
+    ignore row locks (SQLite) as well.
+    """
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=LEASE_SECONDS)
+    with get_session() as session:
+        query = select(EvaluationRun)
+        if run_id is not None:
+            query = query.where(EvaluationRun.id == run_id)
+        run = session.exec(
+            query
+            .where(
+                or_(
+                    EvaluationRun.status == "pending",
+                    and_(
+                        EvaluationRun.status == "running",
+                        or_(
+                            EvaluationRun.lease_expires_at < now,
+                            # Started in-process (no lease) and not touched for a full lease period
+                            and_(EvaluationRun.lease_expires_at.is_(None), EvaluationRun.updated_at < stale),
+                        ),
+                    ),
+                )
+            )
+            .order_by(EvaluationRun.created_at)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        ).first()
+        if run is None:
+            return None
+        # Read before the commit, which expires the instance and would reload it as "running"
+        run_id, was_running, previous_worker = run.id, run.status == "running", run.worker_id
+        claimed = session.execute(
+            update(EvaluationRun)
+            .where(EvaluationRun.id == run_id, EvaluationRun.attempts == run.attempts)
+            .values(
+                # Marked running in the same statement so other workers stop seeing it as pending
+                status="running",
+                updated_at=now,
+                worker_id=worker_id,
+                heartbeat_at=now,
+                lease_expires_at=now + timedelta(seconds=LEASE_SECONDS),
+                attempts=run.attempts + 1,
+            )
+        )
+        session.commit()
+        if claimed.rowcount != 1:
+            return None
+        if was_running:
+            logger.info("Worker %s reclaimed run %s from expired worker %s", worker_id, run_id, previous_worker)
+        return run_id
+
+
+def renew_lease(run_id: int, worker_id: str) -> bool:
+    now = datetime.utcnow()
+    with get_session() as session:
+        result = session.execute(
+            update(EvaluationRun)
+            .where(EvaluationRun.id == run_id, EvaluationRun.worker_id == worker_id)
+            .values(heartbeat_at=now, lease_expires_at=now + timedelta(seconds=LEASE_SECONDS))
+        )
+        session.commit()
+        return result.rowcount == 1
+
+
+def release_lease(run_id: int, worker_id: str, expire: bool = False) -> None:
+    # expire=True hands an unfinished run straight to the next worker instead of waiting out the lease
+    with get_session() as session:
+        session.execute(
+            update(EvaluationRun)
+            .where(EvaluationRun.id == run_id, EvaluationRun.worker_id == worker_id)
+            .values(lease_expires_at=datetime.utcnow() if expire else None)
+        )
+        session.commit()
+
+
+async def run_with_lease(run_id: int, worker_id: str) -> None:
+    """Execute a run claimed by ``worker_id``, renewing its lease until it finishes or is taken over."""
+    run_task = asyncio.create_task(run_evaluation_async(run_id))
+    try:
+        while True:
+            done, _ = await asyncio.wait({run_task}, timeout=HEARTBEAT_SECONDS)
+            if done:
+                break
+            if not await asyncio.to_thread(renew_lease, run_id, worker_id):
+                # Another worker took over after our lease lapsed; stop duplicating its work
+                logger.warning("Worker %s lost the lease on run %s", worker_id, run_id)
+                run_task.cancel()
+                break
+        await run_task
+        await asyncio.to_thread(release_lease, run_id, worker_id)
+    except asyncio.CancelledError:
+        run_task.cancel()
+        await asyncio.gather(run_task, return_exceptions=True)
+        await asyncio.to_thread(release_lease, run_id, worker_id, True)
+        raise
+
+
+async def worker_loop(worker_id: str, max_runs: int = MAX_RUNS_PER_WORKER) -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+
+    eviction_task = await start_provider_registry()
+    slots = asyncio.Semaphore(max(1, max_runs))
+    running: Set[asyncio.Task] = set()
+    logger.info("Worker %s started (max %d concurrent runs)", worker_id, max_runs)
+
+    stopping = asyncio.create_task(stop.wait())
+    while not stop.is_set():
+        # Waiting for a free slot must not delay shutdown while every slot is busy
+        acquire = asyncio.create_task(slots.acquire())
+        await asyncio.wait({acquire, stopping}, return_when=asyncio.FIRST_COMPLETED)
+        if stop.is_set():
+            acquire.cancel()
+            acquired = await asyncio.gather(acquire, return_exceptions=True)
+            if acquired[0] is True:
+                slots.release()
+            break
+        run_id = await asyncio.to_thread(claim_next_run, worker_id)
+        if run_id is None:
+            slots.release()
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        logger.info("Worker %s claimed run %s", worker_id, run_id)
+        task = asyncio.create_task(run_with_lease(run_id, worker_id))
+        running.add(task)
+        task.add_done_callback(running.discard)
+        task.add_done_callback(lambda _: slots.release())
+
+    stopping.cancel()
+    logger.info("Worker %s shutting down; releasing %d runs", worker_id, len(running))
+    for task in list(running):
+        task.cancel()
+    await asyncio.gather(*running, return_exceptions=True)
+    eviction_task.cancel()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Evaluation worker: claims queued runs from the database and executes them.")
+    parser.add_argument("--worker-id", default=None, help="Defaults to <hostname>-<pid>-<random>")
+    parser.add_argument("--max-runs", type=int, default=MAX_RUNS_PER_WORKER, help="Runs executed concurrently by this process")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    worker_id = args.worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    init_db()
+    asyncio.run(worker_loop(worker_id, args.max_runs))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""Status-endpoint latency under load: GET /evaluations/{id} while a large evaluation is running.
+
+Run from the backend directory:
+
+    python benchmarks/load_test.py --items 50000 --duration-s 30 --concurrency 32
+
+By default a uvicorn server is started on a free port against a temporary SQLite database (or
+``--database-url``), with the mock provider and judge stub. Pass ``--base-url`` to target a server
+that is already running instead; it must accept the mock provider. The status endpoint is measured
+once before the run starts (baseline) and once while it is in progress, and p50/p95/p99 are printed
+for both.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(database_url: str, port: int, latency_ms: float, workdir: str) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update(
+        # Run from the scratch directory so uploaded datasets land there and are removed afterwards
+        PYTHONPATH=str(BACKEND_DIR),
+        DATABASE_URL=database_url,
+        EVALUATION_EXECUTOR="inline",
+        RESUME_RUNS_ON_STARTUP="false",
+        GENERATION_CACHE_DISABLED="1",
+        JUDGE_PROVIDER="mock",
+        JUDGE_MODEL="judge",
+        MOCK_LATENCY_MS=str(latency_ms),
+        MOCK_LATENCY_DISTRIBUTION="exponential",
+    )
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=workdir,
+        env=env,
+    )
+
+
+async def wait_until_up(client: httpx.AsyncClient, timeout_s: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout_s
+    while True:
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        if time.monotonic() > deadline:
+            raise RuntimeError("server did not start")
+        await asyncio.sleep(0.2)
+
+
+def percentiles(latencies: List[float]) -> Dict[str, Any]:
+    if not latencies:
+        return {"requests": 0}
+    ordered = sorted(latencies)
+
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))] * 1000, 2)
+
+    return {
+        "requests": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 2),
+        "p50_ms": pick(50),
+        "p95_ms": pick(95),
+        "p99_ms": pick(99),
+        "max_ms": round(ordered[-1] * 1000, 2),
+    }
+
+
+async def hammer(client: httpx.AsyncClient, path: str, concurrency: int, duration_s: float) -> Dict[str, Any]:
+    latencies: List[float] = []
+    failures = 0
+    deadline = time.monotonic() + duration_s
+
+    async def loop() -> None:
+        nonlocal failures
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                response = await client.get(path)
+                response.raise_for_status()
+            except httpx.HTTPError:
+                failures += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(loop() for _ in range(concurrency)))
+    return {**percentiles(latencies), "failures": failures, "requests_per_s": round(len(latencies) / duration_s, 1)}
+
+
+async def run(args: argparse.Namespace, base_url: str) -> Dict[str, Any]:
+    limits = httpx.Limits(max_connections=args.concurrency + 4)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60.0, limits=limits) as client:
+        await wait_until_up(client)
+        lines = "".join(
+            json.dumps({"input": f"load test question {i}", "reference": f"load test question {i}"}) + "\n"
+            for i in range(args.items)
+        )
+        upload = await client.post("/datasets", files={"file": ("load_test.jsonl", lines.encode("utf-8"))}, params={"name": "load-test"})
+        upload.raise_for_status()
+        dataset_id = upload.json()["dataset_id"]
+
+        # Baseline: the same endpoint for a one-item run, before the large run starts
+        probe = await client.post("/evaluations", json={
+            "name": "load-test-probe", "dataset_id": dataset_id, "model_provider": "mock", "model_name": "echo",
+            "metrics": ["exact_match"], "limit": 1,
+        })
+        probe_id = probe.json()["run_id"]
+        baseline = await hammer(client, f"/evaluations/{probe_id}", args.concurrency, min(args.duration_s, 10.0))
+
+        created = await client.post("/evaluations", json={
+            "name": "load-test", "dataset_id": dataset_id, "model_provider": "mock", "model_name": "echo",
+            "metrics": args.metrics.split(","), "concurrency": args.run_concurrency, "reuse_generations": False,
+        })
+        created.raise_for_status()
+        run_id = created.json()["run_id"]
+        # Let the run reach steady state before measuring
+        await asyncio.sleep(args.warmup_s)
+        under_load = await hammer(client, f"/evaluations/{run_id}", args.concurrency, args.duration_s)
+        status = (await client.get(f"/evaluations/{run_id}")).json()
+    return {
+        "baseline": baseline,
+        "during_run": under_load,
+        "run_status": status["status"],
+        "run_items_done": status["num_items"],
+        "run_items_per_s": (status.get("progress") or {}).get("items_per_s"),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", help="Target an already running server instead of starting one")
+    parser.add_argument("--database-url", help="DATABASE_URL for the started server (default: temporary SQLite)")
+    parser.add_argument("--items", type=int, default=50000)
+    parser.add_argument("--metrics", default="exact_match,rougeL,answer_relevancy,correctness")
+    parser.add_argument("--run-concurrency", type=int, default=256, help="The evaluation's own concurrency")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Mean mock model/judge latency")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent status pollers")
+    parser.add_argument("--duration-s", type=float, default=30.0)
+    parser.add_argument("--warmup-s", type=float, default=3.0)
+    parser.add_argument("--p99-budget-ms", type=float, help="Exit non-zero when the in-run p99 exceeds this")
+    args = parser.parse_args()
+
+    server: Optional[subprocess.Popen] = None
+    workdir = tempfile.TemporaryDirectory(prefix="llm-checks-load-")
+    try:
+        base_url = args.base_url
+        if base_url is None:
+            port = _free_port()
+            database_url = args.database_url or f"sqlite:///{Path(workdir.name) / 'load_test.sqlite'}"
+            server = start_server(database_url, port, args.latency_ms, workdir.name)
+            base_url = f"http://127.0.0.1:{port}"
+        result = asyncio.run(run(args, base_url))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+        workdir.cleanup()
+
+    print(json.dumps(result, indent=2))
+    if args.p99_budget_ms is not None and result["during_run"].get("p99_ms", 0) > args.p99_budget_ms:
+        print(f"FAIL: p99 {result['during_run']['p99_ms']}ms exceeds the {args.p99_budget_ms}ms budget")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""Cold-start benchmark: time `import app.main` in fresh interpreters and check no heavy SDK is loaded.
+
+Run from the backend directory:
+
+    python benchmarks/startup.py --runs 5 --budget-s 1.5
+
+Exits non-zero when the median import time exceeds the budget, or when importing the app (or
+serving ``GET /metrics``) pulls in a metric backend or provider SDK that should load lazily.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Modules that must only be imported when an evaluation actually needs them
+LAZY_MODULES = [
+    "litellm",
+    "google.generativeai",
+    "sacrebleu",
+    "rouge_score",
+    "nltk",
+    "transformers",
+    "torch",
+]
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - start
+loaded = [m for m in {lazy!r} if m in sys.modules]
+if {check_metrics!r}:
+    from fastapi.testclient import TestClient
+    TestClient(app.main.app).get("/metrics").raise_for_status()
+    loaded += [m for m in {lazy!r} if m in sys.modules and m not in loaded]
+print(json.dumps({{"seconds": elapsed, "loaded": loaded}}))
+"""
+
+
+def measure_once(check_metrics: bool) -> dict:
+    env = dict(os.environ)
+    # Importing the app must not need a reachable database
+    env.setdefault("DATABASE_URL", "sqlite://")
+    probe = _PROBE.format(lazy=LAZY_MODULES, check_metrics=check_metrics)
+    out = subprocess.run(
+        [sys.executable, "-c", probe], cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-s", type=float, default=float(os.getenv("STARTUP_BUDGET_S", "1.5")))
+    args = parser.parse_args()
+
+    timings = []
+    loaded = set()
+    for i in range(args.runs):
+        # The first run also exercises GET /metrics; later runs time the bare import
+        result = measure_once(check_metrics=i == 0)
+        timings.append(result["seconds"])
+        loaded.update(result["loaded"])
+
+    median = statistics.median(timings)
+    print(f"import app.main: median {median:.3f}s, min {min(timings):.3f}s, max {max(timings):.3f}s over {args.runs} runs")
+    ok = True
+    if loaded:
+        print(f"FAIL: eagerly imported {sorted(loaded)}")
+        ok = False
+    if median > args.budget_s:
+        print(f"FAIL: median exceeds the {args.budget_s:.2f}s budget")
+        ok = False
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -11,6 +11,17 @@ type ItemScore = {
   scores: Record<string, number>;
 };
 
+type MetricProgress = { count: number; mean: number | null; stddev: number; p10: number | null; p50: number | null; p90: number | null };
+
+type Progress = {
+  completed: number;
+  total: number | null;
+  num_errors: number;
+  items_per_s: number;
+  eta_s: number | null;
+  metrics: Record<string, MetricProgress>;
+};
+
 type Results = {
   run_id: number;
   metrics: string[];
@@ -21,25 +32,53 @@ type Results = {
 export default function RunDetails({ params }: { params: { id: string } }) {
   const runId = params.id;
   const [status, setStatus] = useState<string>('pending');
+  const [progress, setProgress] = useState<Progress | null>(null);
   const [results, setResults] = useState<Results | null>(null);
 
-  const refresh = async () => {
-    const sRes = await fetch(`${API}/evaluations/${runId}`);
-    const s = await sRes.json();
-    setStatus(s.status);
-    if (s.status === 'completed') {
-      const rRes = await fetch(`${API}/evaluations/${runId}/results`);
-      if (rRes.ok) setResults(await rRes.json());
-    }
+  const loadResults = async () => {
+    const rRes = await fetch(`${API}/evaluations/${runId}/results`);
+    if (rRes.ok) setResults(await rRes.json());
   };
 
-  useEffect(() => { refresh(); const id = setInterval(refresh, 3000); return () => clearInterval(id); }, []);
+  useEffect(() => {
+    // The server pushes a `progress` event on every change and a final `done` event, so no polling is needed
+    const source = new EventSource(`${API}/evaluations/${runId}/events`);
+    const onUpdate = (e: MessageEvent) => {
+      const s = JSON.parse(e.data);
+      setStatus(s.status);
+      if (s.progress) setProgress(s.progress);
+    };
+    source.addEventListener('progress', onUpdate);
+    source.addEventListener('done', (e) => {
+      onUpdate(e as MessageEvent);
+      source.close();
+      if (JSON.parse((e as MessageEvent).data).status === 'completed') loadResults();
+    });
+    return () => source.close();
+  }, []);
 
   return (
     <div>
       <div className="card">
         <h2>Run {runId}</h2>
         <div>Status: {status}</div>
+        {progress && (
+          <div style={{ marginTop: 8 }}>
+            <div>
+              {progress.completed}{progress.total != null ? ` / ${progress.total}` : ''} items
+              {progress.num_errors > 0 && ` (${progress.num_errors} errors)`}
+              {status === 'running' && ` · ${progress.items_per_s.toFixed(1)} items/s`}
+              {status === 'running' && progress.eta_s != null && ` · ETA ${Math.ceil(progress.eta_s)}s`}
+            </div>
+            {!results && (
+              <div style={{ color: '#555' }}>
+                {Object.entries(progress.metrics).filter(([, m]) => m.mean != null).map(([k, m]) => (
+                  <div key={k}>{k}: {m.mean!.toFixed(3)} ± {m.stddev.toFixed(3)} (p50 {m.p50?.toFixed(2)}, p90 {m.p90?.toFixed(2)})</div>
+                ))}
+              </div>
+            )}
+          </div>
+        )}
         {results && (
           <div style={{ marginTop: 12 }}>
             <h3>Aggregate</h3>